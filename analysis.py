@@ -6,6 +6,8 @@ import matplotlib.pyplot as plt
 import pandas as pd
 from pandasgui import show
 
+from src.utils.resultsStore import connect, append_result, best_and_worst_runs
+
 path_to_results = Path(__file__).parent / "results"
 path_to_best_results = path_to_results.parent / "best_results"
 path_to_worst_results = path_to_results.parent / "worst_results"
@@ -31,37 +33,51 @@ def flatten_json(json_data, prefix=''):
     return flattened
 
 
-def flatten_all_json_files_in_dir():
-    directory = path_to_results
-    results = []
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            file_path = os.path.join(directory, filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                flattened_data = flatten_json(data)
-                results.append(flattened_data)
+def load_results():
+    """
+    All runs of the results store, one row per run with the configuration as data_* columns and the solution as
+    solution_* columns.
+    """
+    connection = connect()
+    try:
+        rows = connection.execute("SELECT parameters, solution FROM runs ORDER BY id").fetchall()
+    finally:
+        connection.close()
+    results = [flatten_json({"data": json.loads(row["parameters"]), "solution": json.loads(row["solution"])})
+               for row in rows]
     df = pd.DataFrame(results)
     df.to_csv(path_to_results / "flattened_results.csv", index=False)
     return df
 
 
-def best_and_worst_results(df, dataset: int, algorithm: str):
-    data = df[(df['solution_dataset'] == dataset) & (df['solution_algorithm'] == algorithm)]
-    best = data.loc[data['solution_best_distance'].idxmin()]
-    worst = data.loc[data['solution_best_distance'].idxmax()]
-    path_to_best_results = path_to_results.parent / "best_results"
-    path_to_worst_results = path_to_results.parent / "worst_results"
+def import_json_results(directory=path_to_results):
+    """
+    Append the runs of a directory of JSON results files, as written before the results store, to the store.
+    """
+    for filename in os.listdir(directory):
+        if filename.endswith(".json"):
+            with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            solution = data["solution"]
+            append_result(solution["dataset"], solution["algorithm"], data.get("data", {}), solution)
+
+
+def best_and_worst_results(dataset, algorithm: str):
+    best, worst = best_and_worst_runs(dataset, algorithm)
+    if best is None:
+        raise ValueError(f"No {algorithm} run on dataset {dataset} in the results store")
+    best = flatten_json({"data": best["parameters"], "solution": best["solution"]})
+    worst = flatten_json({"data": worst["parameters"], "solution": worst["solution"]})
 
     if not os.path.exists(path_to_best_results):
         os.makedirs(path_to_best_results)
     with open(path_to_best_results / f"best_results_{dataset}_{algorithm}.json", 'w', encoding='utf-8') as jsonfile:
-        json.dump(best.to_dict(), jsonfile, ensure_ascii=False, indent=4)
+        json.dump(best, jsonfile, ensure_ascii=False, indent=4, default=str)
 
     if not os.path.exists(path_to_worst_results):
         os.makedirs(path_to_worst_results)
     with open(path_to_worst_results / f"worst_results_{dataset}_{algorithm}.json", 'w', encoding='utf-8') as jsonfile:
-        json.dump(worst.to_dict(), jsonfile, ensure_ascii=False, indent=4)
+        json.dump(worst, jsonfile, ensure_ascii=False, indent=4, default=str)
 
     return print(best), print(worst)
 
@@ -82,5 +98,5 @@ def plot_barplot(df):
 
 
 if __name__ == "__main__":
-    df = flatten_all_json_files_in_dir()
+    df = load_results()
     show(df)
@@ -0,0 +1,178 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+from src.instance.instance import get_instance, get_instance_name
+from src.instance.instanceGenerator import generate_instance
+from src.simulatedAnnealing.calculations import calculate_distance_matrix, get_distance_matrix
+from src.simulatedAnnealing.n_opt import one_opt_operator, two_opt_operator
+from src.simulatedAnnealing.simulatedAnnealing import simulatedAnnealing, SimulatedAnnealing
+from src.simulatedAnnealing.simulatedAnnealing_soft_window import getSimulatedAnnelingSoft, is_feasible_soft, \
+    sum_penalty
+from src.simulatedAnnealing.unrolling import relocation, find_and_swap_nodes
+from src.utils import resultsStore, save
+from src.utils.feasibilityCheck import is_feasible, RouteSchedules
+from src.VRPTW.solomonInsertion import create_solomon_initial_solution
+from src.VRPTW.VRPTW import clarkewright_savings
+
+path_to_benchmarks = Path(__file__).parent.resolve()
+baseline_file = path_to_benchmarks / "baseline.json"
+
+
+@contextlib.contextmanager
+def scratch_results():
+    """
+    Send the results saved by the benchmarked solvers to a temporary directory instead of results/, and their
+    printing nowhere.
+    """
+    results_store_path, path_to_repo = resultsStore.results_store_path, save.path_to_repo
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        resultsStore.results_store_path = Path(directory) / "results.sqlite"
+        save.path_to_repo = Path(directory)
+        try:
+            yield
+        finally:
+            resultsStore.results_store_path, save.path_to_repo = results_store_path, path_to_repo
+
+
+def benchmark_cases(dataset):
+    """
+    Zero-argument calls to time on the dataset, by name. The feasibility and penalty cases check every route of
+    the Solomon I1 solution once per call; the operators propose one move on a copy of it with cached schedules.
+    """
+    data = get_instance(dataset)
+    distance_matrix = get_distance_matrix(dataset)
+    with contextlib.redirect_stdout(io.StringIO()):
+        routes = create_solomon_initial_solution(dataset, data.num_vehicles)
+    schedules = RouteSchedules(routes, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                               distance_matrix)
+    soft = getSimulatedAnnelingSoft()
+    arguments = (data.demand, data.capacity, data.ready_time, data.due_time, data.service_time, distance_matrix)
+    sa = SimulatedAnnealing(starting_method="solomon", initial_temperature=0.5, alpha=0.9, final_temperature=0.001,
+                            cooling_schedule="geometric", constant_k=0.7, neighborhood_size=5,
+                            neighborhood_selection="1_opt", seed=0, plot=False)
+
+    return {
+        "calculate_distance_matrix": lambda: calculate_distance_matrix(data.locations),
+        "is_feasible": lambda: [is_feasible(route, *arguments) for route in routes],
+        "is_feasible_soft": lambda: [is_feasible_soft(route, *arguments) for route in routes],
+        "sum_penalty": lambda: sum_penalty(soft, routes, data.ready_time, data.due_time, data.service_time,
+                                           distance_matrix),
+        "relocation": lambda: relocation(routes.copy(), *arguments, schedules),
+        "find_and_swap_nodes": lambda: find_and_swap_nodes(routes.copy(), data.locations, *arguments, schedules),
+        "one_opt_operator": lambda: one_opt_operator(routes.copy(), *arguments, schedules),
+        "two_opt_operator": lambda: two_opt_operator(routes.copy(), *arguments, schedules),
+        "clarkewright_savings": lambda: clarkewright_savings(dataset, plot=False),
+        # Every call repeats the same run
+        "simulated_annealing": lambda: (random.seed(0), simulatedAnnealing(dataset, sa))
+    }
+
+
+def measure(function, min_time, rounds):
+    """
+    Calls per second of the function, the best of rounds timing rounds of at least min_time seconds each, and the
+    peak memory traced by tracemalloc during one call. random is reseeded before the warm-up call, every round and
+    the traced call, so the operators propose the same sequence of moves in every round and every run.
+    """
+    random.seed(0)
+    function()
+    ops_per_sec = 0.0
+    for _ in range(rounds):
+        random.seed(0)
+        calls = 0
+        start = perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            function()
+            calls += 1
+            elapsed = perf_counter() - start
+        ops_per_sec = max(ops_per_sec, calls / elapsed)
+
+    random.seed(0)
+    tracemalloc.start()
+    function()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ops_per_sec": ops_per_sec, "peak_bytes": peak_bytes}
+
+
+def run_benchmarks(datasets, min_time=0.2, rounds=3):
+    results = {}
+    with scratch_results():
+        for dataset in datasets:
+            for name, function in benchmark_cases(dataset).items():
+                results[f"{get_instance_name(dataset)}/{name}"] = measure(function, min_time, rounds)
+                print(f"{get_instance_name(dataset)}/{name}: {results[f'{get_instance_name(dataset)}/{name}']}",
+                      file=sys.stderr)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=0.25, min_peak_bytes=64 * 1024):
+    """
+    Benchmarks more than tolerance slower than the baseline, or using more than tolerance more peak memory than
+    it (ignoring differences below min_peak_bytes). Returns one line per regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        reference = baseline["results"][name]
+        if result["ops_per_sec"] < reference["ops_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ops_per_sec']:.1f} ops/sec, "
+                               f"baseline {reference['ops_per_sec']:.1f}")
+        if result["peak_bytes"] > reference["peak_bytes"] * (1 + tolerance) and \
+                result["peak_bytes"] - reference["peak_bytes"] > min_peak_bytes:
+            regressions.append(f"{name}: {result['peak_bytes']} peak bytes, baseline {reference['peak_bytes']}")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print(f"{'benchmark':<45}{'ops/sec':>14}{'baseline':>14}{'peak KiB':>12}")
+    for name, result in results.items():
+        reference = baseline["results"].get(name) if baseline else None
+        print(f"{name:<45}{result['ops_per_sec']:>14.1f}"
+              f"{reference['ops_per_sec'] if reference else float('nan'):>14.1f}{result['peak_bytes'] / 1024:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the kernels, operators and solvers and compare the results "
+                                                 "with the local baseline.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[200, 1000],
+                        help="customers of the generated instances, besides the 9 and 20 node datasets")
+    parser.add_argument("--instance-class", default="R", choices=["C", "R", "RC"],
+                        help="class of the generated instances")
+    parser.add_argument("--windows", default="tight", choices=["tight", "wide"],
+                        help="time windows of the generated instances")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    parser.add_argument("--rounds", type=int, default=3, help="timing rounds, the best one counts")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown or memory growth")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    args = parser.parse_args()
+
+    datasets = [9, 20] + [generate_instance(size, args.instance_class, args.windows) for size in args.sizes]
+    results = run_benchmarks(datasets, args.min_time, args.rounds)
+    baseline = None
+    if baseline_file.exists():
+        with open(baseline_file, 'r', encoding='utf-8') as jsonfile:
+            baseline = json.load(jsonfile)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as jsonfile:
+            json.dump({"created": datetime.now().isoformat(), "python": platform.python_version(),
+                       "machine": platform.platform(), "results": results}, jsonfile, indent=4)
+        print(f"Baseline saved as {baseline_file}")
+    elif baseline is not None:
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -1,65 +1,136 @@
+import os
 from datetime import datetime
+from multiprocessing import Pool
+
+import numpy as np
+from sklearn.model_selection import ParameterGrid
 
 from src.instance.instance import get_instance
 
-from src.simulatedAnnealing.calculations import calculate_total_distance, calculate_distance_matrix, \
+from src.simulatedAnnealing.calculations import calculate_total_distance, get_distance_matrix, \
     create_initial_solution_for_vrp
 from src.utils.plots import visualize_routes
 from src.utils.solution import createSolution
-from src.utils.feasibilityCheck import is_feasible
+from src.utils.feasibilityCheck import is_feasible, RouteSchedules
 from src.utils.save import save_solution
+from src.sweep import share_arrays, attach_arrays, share_instance, attach_shared_instance
 
 
-def clarkewright_savings(dataset):
-    # Step 1: Calculate savings
-    startSearchClock = datetime.now().timestamp()
-    data = get_instance(dataset)
-    num_customers = len(data.id)
+# Savings terms of the instance in the workers of generalized_savings
+shared_savings = {}
 
-    depot = 0
 
-    distance_matrix = calculate_distance_matrix(data.locations)
-    savings = {}
+def savings_components(distance_matrix, demand, depot=0):
+    """
+    Terms of the generalized savings of every pair of customers i < j: the depot distances d0i + d0j, the pair
+    distance dij, the asymmetry |d0i - d0j| and the pair demand (qi + qj) relative to the mean demand.
+    """
+    num_nodes = len(distance_matrix)
+    customers_1, customers_2 = np.triu_indices(num_nodes - 1, 1)
+    customers_1 += 1
+    customers_2 += 1
+    depot_distance_1 = distance_matrix[depot, customers_1]
+    depot_distance_2 = distance_matrix[depot, customers_2]
+    return {
+        "customers_1": customers_1,
+        "customers_2": customers_2,
+        "depot_distances": depot_distance_1 + depot_distance_2,
+        "pair_distance": distance_matrix[customers_1, customers_2],
+        "asymmetry": np.abs(depot_distance_1 - depot_distance_2),
+        "demand": (demand[customers_1] + demand[customers_2]) / demand[1:].mean()
+    }
 
-    for customer_1 in range(1, num_customers):
-        for customer_2 in range(customer_1 + 1, num_customers):
-            distance_i = distance_matrix[depot, customer_1]
-            distance_j = distance_matrix[depot, customer_2]
-            distance_ij = distance_matrix[customer_1, customer_2]
-            savings[(customer_1, customer_2)] = distance_i + distance_j - distance_ij
 
-    # Step 2: Sort savings in descending order
-    sorted_savings = sorted(savings.items(), key=lambda x: x[1], reverse=True)
+def order_savings(components, shape=1.0, asymmetry=0.0, demand=0.0):
+    """
+    Pairs of customers in descending order of the savings d0i + d0j - shape * dij + asymmetry * |d0i - d0j| +
+    demand * (qi + qj) / mean(q), ties in the order of i and then j. The default weights give the classical savings.
+    """
+    savings = components["depot_distances"] - shape * components["pair_distance"] + \
+        asymmetry * components["asymmetry"] + demand * components["demand"]
+    order = np.argsort(-savings, kind="stable")
+    return components["customers_1"][order], components["customers_2"][order]
 
-    # Step 3: Initialize routes and merge based on savings
-    routes = create_initial_solution_for_vrp(data.id)
-    visualize_routes(dataset, routes, "initial_solution_for_savings", show=False, save=True)
-    initial_distance = calculate_total_distance(routes, distance_matrix)
+
+def merge_savings(routes, data, distance_matrix, customers_1, customers_2):
+    """
+    Merge the routes pair by pair in the given order of customer pairs, appending the route of the second customer
+    to the route of the first whenever the combined route is feasible.
+    """
     capacity = data.capacity  # Assuming all vehicles have the same capacity
 
-    for (customer_1, customer_2), saving in sorted_savings:
-        route_i = None
-        route_j = None
-        for route in routes:
-            if customer_1 in route:
-                route_i = route
-            if customer_2 in route:
-                route_j = route
-            if route_i and route_j:
-                break
-
-        if route_i != route_j and route_i and route_j:
-            new_route = route_i[:-1] + route_j[1:]
-            if is_feasible(new_route, data.demand, capacity, data.ready_time, data.due_time, data.service_time,
-                           distance_matrix):
-                routes.remove(route_i)
-                routes.remove(route_j)
-                routes.append(new_route)
+    # Routes by id with their cached schedules, and the route of every customer. A merged route gets a new order
+    # key, so the routes are listed in the order in which they were last created
+    schedules = RouteSchedules([], data.demand, capacity, data.ready_time, data.due_time, data.service_time,
+                               distance_matrix)
+    route_schedules = {route_id: schedules.build(route) for route_id, route in enumerate(routes)}
+    route_of = [0] * len(data.id)
+    for route_id, route in enumerate(routes):
+        route_of[route[1]] = route_id
+    route_order = list(range(len(routes)))
+    merges = 0
 
-    # Step 4: Adjust routes to respect time windows
+    for customer_1, customer_2 in zip(customers_1.tolist(), customers_2.tolist()):
+        if len(route_schedules) == 1:
+            break
+        route_i, route_j = route_of[customer_1], route_of[customer_2]
+        if route_i == route_j:
+            continue
+
+        # Route i followed by route j is feasible if route i is, the vehicle reaches the first customer of route j
+        # before its latest start time and the combined load fits
+        schedule_i, schedule_j = route_schedules[route_i], route_schedules[route_j]
+        last_i = len(schedule_i.route) - 1
+        if schedule_i.first_violation == last_i and schedule_i.load + schedule_j.load <= capacity and \
+                schedule_i.departure[-1] + distance_matrix[schedule_i.route[-2], schedule_j.route[1]] <= \
+                schedule_j.latest_start[1]:
+            new_route = schedule_i.route[:-1] + schedule_j.route[1:]
+            for customer in schedule_j.route[1:-1]:
+                route_of[customer] = route_i
+            route_schedules[route_i] = schedules.build(new_route)
+            del route_schedules[route_j]
+            merges += 1
+            route_order[route_i] = len(routes) + merges
+
+    return [route_schedules[route_id].route for route_id in sorted(route_schedules, key=route_order.__getitem__)]
+
+
+def merge_to_fleet(routes, data, distance_matrix, num_vehicles):
+    """
+    Merge feasible routes until there are at most num_vehicles of them, each time appending to another route the
+    route that adds the least distance. Raises ValueError when no feasible merge is left.
+    """
+    schedules = RouteSchedules([], data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                               distance_matrix)
+    route_schedules = [schedules.build(route) for route in routes]
+    while len(route_schedules) > num_vehicles:
+        best_merge = None
+        for i, schedule_i in enumerate(route_schedules):
+            route_i = schedule_i.route
+            if schedule_i.first_violation < len(route_i) - 1:
+                continue
+            for j, schedule_j in enumerate(route_schedules):
+                # Same feasibility test as merge_savings, from the last customer of route i to the first of route j
+                last, first = route_i[-2], schedule_j.route[1]
+                if i == j or schedule_i.load + schedule_j.load > data.capacity or \
+                        schedule_i.departure[-1] + distance_matrix[last, first] > schedule_j.latest_start[1]:
+                    continue
+                added_distance = distance_matrix[last, first] - distance_matrix[last, route_i[-1]] - \
+                    distance_matrix[schedule_j.route[0], first]
+                if best_merge is None or added_distance < best_merge[0]:
+                    best_merge = (added_distance, i, j)
+        if best_merge is None:
+            raise ValueError(f"{len(routes)} routes cannot be merged into the {num_vehicles} vehicles of the instance")
+        _, i, j = best_merge
+        route_schedules[i] = schedules.build(route_schedules[i].route[:-1] + route_schedules[j].route[1:])
+        del route_schedules[j]
+    return [schedule.route for schedule in route_schedules]
+
+
+def keep_feasible_routes(routes, data, distance_matrix, depot=0):
     feasible_routes = []
     for route in routes:
-        if is_feasible(route, data.demand, capacity, data.ready_time, data.due_time, data.service_time,
+        if is_feasible(route, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
                        distance_matrix):
             # Ensure the route starts and ends with the depot
             if route[0] != depot:
@@ -69,6 +140,44 @@ def clarkewright_savings(dataset):
             feasible_routes.append(route)
         else:
             print(f"Route {route} is not feasible due to time window constraints.")
+    return feasible_routes
+
+
+def create_savings_initial_solution(instance, num_routes):
+    """
+    Routes of the classical savings construction as a starting solution, without plotting or saving them.
+    Unlike clarkewright_savings no route is dropped, so every customer is visited, and routes are merged with
+    merge_to_fleet until there are at most num_routes.
+    """
+    data = get_instance(instance)
+    distance_matrix = get_distance_matrix(instance)
+    customers_1, customers_2 = order_savings(savings_components(distance_matrix, data.demand))
+    routes = merge_savings(create_initial_solution_for_vrp(data.id), data, distance_matrix, customers_1, customers_2)
+    routes = merge_to_fleet(routes, data, distance_matrix, num_routes)
+    print(f"Initial solution: {routes}")
+    return routes
+
+
+def clarkewright_savings(dataset, plot=True):
+    # Step 1: Calculate savings
+    startSearchClock = datetime.now().timestamp()
+    data = get_instance(dataset)
+
+    depot = 0
+
+    distance_matrix = get_distance_matrix(dataset)
+    # Step 2: Sort savings in descending order
+    customers_1, customers_2 = order_savings(savings_components(distance_matrix, data.demand, depot))
+
+    # Step 3: Initialize routes and merge based on savings
+    routes = create_initial_solution_for_vrp(data.id)
+    if plot:
+        visualize_routes(dataset, routes, "initial_solution_for_savings", show=False, save=True)
+    initial_distance = calculate_total_distance(routes, distance_matrix)
+    routes = merge_savings(routes, data, distance_matrix, customers_1, customers_2)
+
+    # Step 4: Adjust routes to respect time windows
+    feasible_routes = keep_feasible_routes(routes, data, distance_matrix, depot)
 
     for i, route in enumerate(feasible_routes):
         print(f"Route {i}: {route}")
@@ -82,7 +191,8 @@ def clarkewright_savings(dataset):
     solutions = []
     accepted_solutions = []
     acceptance_probabilities = []
-    visualize_routes(dataset, feasible_routes, "clarkewright_savings", show=False, save=True)
+    if plot:
+        visualize_routes(dataset, feasible_routes, "clarkewright_savings", show=False, save=True)
     solution = createSolution(dataset,"Clarkewright_Savings", "none", routes, initial_distance, best_distance, feasible_routes,runtime,
                    temperatures, solutions, accepted_solutions, acceptance_probabilities)
     save_solution(dataset, solution)
@@ -93,3 +203,88 @@ def clarkewright_savings(dataset):
     return solution
 
 
+def attach_generalized_savings(instance_descriptor, savings_descriptor):
+    """
+    Pool initializer: attach the shared instance and savings terms in this worker.
+    """
+    attach_shared_instance(instance_descriptor)
+    shared_savings.update(attach_arrays(savings_descriptor))
+
+
+def run_generalized_savings(job):
+    """
+    Build the savings construction for one combination of weights, returning a JSON-ready summary of it.
+    """
+    dataset, param = job
+    startClock = datetime.now().timestamp()
+    data = get_instance(dataset)
+    distance_matrix = get_distance_matrix(dataset)
+    customers_1, customers_2 = order_savings(shared_savings, **param)
+    routes = merge_savings(create_initial_solution_for_vrp(data.id), data, distance_matrix, customers_1,
+                           customers_2)
+    routes = keep_feasible_routes(routes, data, distance_matrix)
+    return {
+        **param,
+        "best_distance": float(calculate_total_distance(routes, distance_matrix)),
+        "num_routes": len(routes),
+        "runtime": datetime.now().timestamp() - startClock,
+        "best_routes": routes
+    }
+
+
+def generalized_savings(dataset, params=None, workers=None, plot=True):
+    """
+    Generalized savings: the savings construction for every combination of the route shape, asymmetry and demand
+    weights of the parameter grid, over a process pool. The savings terms are computed once and shared with the
+    workers together with the instance. Returns the best construction, with the distance and runtime of every
+    combination in its stats.
+    """
+    startSearchClock = datetime.now().timestamp()
+    data = get_instance(dataset)
+    distance_matrix = get_distance_matrix(dataset)
+    params = params or {
+        "shape": [0.5, 1.0, 1.5, 2.0],
+        "asymmetry": [0.0, 0.5, 1.0],
+        "demand": [0.0, 0.5, 1.0]
+    }
+    jobs = [(dataset, param) for param in ParameterGrid(params)]
+    workers = workers or os.cpu_count()
+    components = savings_components(distance_matrix, data.demand)
+
+    results = []
+    blocks, instance_descriptor = share_instance(dataset)
+    savings_blocks, savings_descriptor = share_arrays(components)
+    try:
+        if workers == 1:
+            shared_savings.update(components)
+            results = list(map(run_generalized_savings, jobs))
+        else:
+            with Pool(workers, initializer=attach_generalized_savings,
+                      initargs=(instance_descriptor, savings_descriptor)) as pool:
+                results = pool.map(run_generalized_savings, jobs)
+    finally:
+        for block in blocks + savings_blocks:
+            block.close()
+            block.unlink()
+
+    # The first combination of the grid wins ties
+    best = min(results, key=lambda result: result["best_distance"])
+    initial_routes = create_initial_solution_for_vrp(data.id)
+    initial_distance = calculate_total_distance(initial_routes, distance_matrix)
+    endSearchClock = datetime.now().timestamp()
+    runtime = endSearchClock - startSearchClock
+
+    stats = {
+        "best_parameters": {name: best[name] for name in params},
+        "parameters": [{key: value for key, value in result.items() if key != "best_routes"} for result in results]
+    }
+    if plot:
+        visualize_routes(dataset, best["best_routes"], "generalized_savings", show=False, save=True)
+    solution = createSolution(dataset, "Generalized_Savings", "none", initial_routes, initial_distance,
+                              best["best_distance"], best["best_routes"], runtime, [], [], [], [], stats)
+    save_solution(dataset, solution)
+    print(f"Runtime: {runtime}")
+    print(f"Best parameters: {stats['best_parameters']}")
+    print(f"Best distance: {solution.best_distance}")
+    print(f"Best routes: {solution.best_routes}")
+    return solution
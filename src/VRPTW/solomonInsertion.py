@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import numpy as np
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing.calculations import get_distance_matrix
+from src.utils.feasibilityCheck import RouteSchedules
+from src.VRPTW.VRPTW import merge_to_fleet
+
+
+def insertion_costs(route, schedule, customers, to_customer, from_customer, data, distance_matrix, alpha_1, mu):
+    """
+    Solomon's c1 criterion for inserting each of the customers at each position of the route:
+    alpha_1 * (d_iu + d_uj - mu * d_ij) + (1 - alpha_1) * (push forward of the service start at j).
+    to_customer and from_customer hold d_iu and d_uj, the distances from the start of every edge of the route to
+    the customers and from the customers to its end. Infeasible insertions cost inf. Returns the costs with one row
+    per customer and one column per position.
+    """
+    route = np.asarray(route)
+    previous, following = route[:-1], route[1:]
+    departure = np.asarray(schedule.departure)
+    latest_start = np.asarray(schedule.latest_start)[1:]
+    customers = customers[:, np.newaxis]
+
+    # Service start at j before the insertion, the end depot is reached without waiting
+    old_start = np.append(departure[1:] - data.service_time[following[:-1]],
+                          departure[-1] + distance_matrix[previous[-1], following[-1]])
+    start_time = np.maximum(departure + to_customer, data.ready_time[customers])
+    departure_time = start_time + data.service_time[customers]
+    arrival_time = departure_time + from_customer
+    new_start = np.where(following == route[0], arrival_time, np.maximum(arrival_time, data.ready_time[following]))
+
+    feasible = (start_time <= data.due_time[customers]) & (arrival_time <= latest_start) & \
+        (schedule.load + data.demand[customers] <= data.capacity)
+    detour = to_customer + from_customer - mu * distance_matrix[previous, following]
+    costs = alpha_1 * detour + (1 - alpha_1) * (new_start - old_start)
+    return np.where(feasible, costs, np.inf)
+
+
+def create_solomon_initial_solution(instance, num_routes, alpha_1=1.0, mu=1.0, lambda_=2.0, seed_criterion="farthest",
+                                    time_limit=10.0):
+    """
+    Solomon's I1 sequential insertion heuristic. A route is started with the unrouted customer farthest from the
+    depot (or with the earliest due time) and the customer maximizing lambda_ * d_0u - c1 at its cheapest feasible
+    position is inserted until no customer fits, then the next route is started. The construction is
+    deterministic. Customers still unrouted after time_limit seconds get a route of their own. Routes are merged
+    with merge_to_fleet until there are at most num_routes.
+    """
+    if seed_criterion not in ["farthest", "earliest_deadline"]:
+        raise ValueError("Seed criterion must be either 'farthest' or 'earliest_deadline'")
+    startClock = datetime.now().timestamp()
+    data = get_instance(instance)
+    distance_matrix = get_distance_matrix(instance)
+    depot = 0
+    schedules = RouteSchedules([], data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                               distance_matrix)
+
+    unrouted = np.arange(1, len(data.id))
+    routes = []
+    while len(unrouted) and datetime.now().timestamp() - startClock < time_limit:
+        if seed_criterion == "farthest":
+            seed = unrouted[np.argmax(distance_matrix[depot, unrouted])]
+        else:
+            seed = unrouted[np.argmin(data.due_time[unrouted])]
+        route = [depot, int(seed), depot]
+        unrouted = unrouted[unrouted != seed]
+        schedule = schedules.build(route)
+        if schedule.first_violation < len(route) - 1:
+            # The seed customer alone already misses its time window
+            routes.append(route)
+            continue
+
+        # Distances between the customers that still fit into the route and the ends of its edges. An insertion
+        # only adds the distances to and from the inserted customer, and a customer that fits nowhere is dropped,
+        # as it never fits again into the longer route
+        candidates = unrouted
+        to_customer = distance_matrix[np.asarray(route[:-1]), candidates[:, np.newaxis]]
+        from_customer = distance_matrix[candidates[:, np.newaxis], np.asarray(route[1:])]
+        while len(candidates) and datetime.now().timestamp() - startClock < time_limit:
+            costs = insertion_costs(route, schedule, candidates, to_customer, from_customer, data, distance_matrix,
+                                    alpha_1, mu)
+            positions = np.argmin(costs, axis=1)
+            best_costs = costs[np.arange(len(candidates)), positions]
+            fits = np.isfinite(best_costs)
+            if not fits.any():
+                break
+            candidates, positions, best_costs = candidates[fits], positions[fits], best_costs[fits]
+            to_customer, from_customer = to_customer[fits], from_customer[fits]
+
+            chosen = np.argmax(lambda_ * distance_matrix[depot, candidates] - best_costs)
+            position, customer = int(positions[chosen]), int(candidates[chosen])
+            route.insert(position + 1, customer)
+            schedule = schedules.build(route)
+            unrouted = unrouted[unrouted != customer]
+            keep = np.arange(len(candidates)) != chosen
+            candidates = candidates[keep]
+            # The edge at position is split in two at the customer
+            to_customer = np.insert(to_customer[keep], position + 1, distance_matrix[customer, candidates], axis=1)
+            from_customer = np.insert(from_customer[keep], position, distance_matrix[candidates, customer], axis=1)
+        routes.append(route)
+
+    routes += [[depot, int(customer), depot] for customer in unrouted]
+    routes = merge_to_fleet(routes, data, distance_matrix, num_routes)
+    print(f"Initial solution: {routes}")
+    return routes
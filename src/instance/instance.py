@@ -1,83 +1,153 @@
 import os
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Union
+
+import numpy as np
 
 file_directory = Path(__file__).parent.parent.parent.resolve() / "data"  # This is the path to the data
 file_prefix = "C1_2"
 
 
+# Instances already parsed in this process, shared by every solver, operator and plot
+instances = {}
+
+
 @dataclass
 class Instance:
-    instance: int
+    """
+    Struct-of-arrays view of an instance: one contiguous read-only array per customer attribute, indexed by
+    customer id (the depot is customer 0).
+    """
+    instance: Union[int, str]
     num_vehicles: int
     capacity: int
-    id: list[int]
-    locations: list[tuple[int, int]]
-    demand: list[int]
-    ready_time: list[int]
-    due_time: list[int]
-    service_time: list[int]
+    id: np.ndarray
+    locations: np.ndarray
+    demand: np.ndarray
+    ready_time: np.ndarray
+    due_time: np.ndarray
+    service_time: np.ndarray
 
+    def __post_init__(self):
+        for name in ["id", "locations", "demand", "ready_time", "due_time", "service_time"]:
+            getattr(self, name).flags.writeable = False
 
-def parse_one_instance(instance):
-    customers = []
 
-    # Construct the filename based on the directory, prefix, and instance
-    filename = os.path.join(file_directory, f"{file_prefix}_{instance}.txt")
+def get_instance_file(instance):
+    """
+    Path of an instance file. An integer selects data/C1_2_<instance>.txt, anything else is taken as the path
+    of a Solomon or Gehring-Homberger file.
+    """
+    if isinstance(instance, (int, np.integer)):
+        # Construct the filename based on the directory, prefix, and instance
+        return os.path.join(file_directory, f"{file_prefix}_{instance}.txt")
+    return os.path.abspath(instance)
+
+
+def get_instance_name(instance):
+    """
+    Short name of an instance, safe to use in file names.
+    """
+    if isinstance(instance, (int, np.integer)):
+        return str(instance)
+    return Path(instance).stem
+
+
+def get_cache_file(filename):
+    # The compiled instance sits next to its source file
+    return os.path.splitext(filename)[0] + ".npz"
+
+
+def parse_one_instance(instance):
+    filename = get_instance_file(instance)
 
     try:
         with open(filename, 'r') as file:
-            lines = file.readlines()
-
-            # Parse VEHICLE section
-            vehicle_section_index = lines.index('VEHICLE\n')
-            capacity_line = lines[vehicle_section_index + 2].strip().split()
-            num_vehicles = int(capacity_line[0])
-            capacity = int(capacity_line[1])
-
-            # Parse CUSTOMER section
-            customer_section_index = lines.index('CUSTOMER\n')
-            customer_data_lines = lines[customer_section_index + 2:]
-
-            for line in customer_data_lines:
-                if line.strip() == '':
-                    continue
-                fields = line.split()
-                if len(fields) == 7:
-                    customer_info = {
-                        'CUST NO.': int(fields[0]),
-                        'XCOORD.': int(fields[1]),
-                        'YCOORD.': int(fields[2]),
-                        'DEMAND': int(fields[3]),
-                        'READY TIME': int(fields[4]),
-                        'DUE DATE': int(fields[5]),
-                        'SERVICE TIME': int(fields[6])
-                    }
-                    customers.append(customer_info)
-
-            # Store vehicle data
-            vehicles = {
-                'num_vehicles': num_vehicles,
-                'capacity': capacity
-            }
-
+            text = file.read()
     except FileNotFoundError:
         print(f"File {filename} not found.")
         return None, None
 
+    # Parse VEHICLE section: the two numbers after the NUMBER / CAPACITY header
+    vehicle_section, customer_section = text.split('CUSTOMER', 1)
+    num_vehicles, capacity = vehicle_section.split('CAPACITY', 1)[1].split()[:2]
+
+    # Parse CUSTOMER section: skip the column header and read every row in one pass
+    customer_rows = customer_section.lstrip().split('\n', 1)[1]
+    customers = np.fromstring(customer_rows, dtype=float, sep=' ').reshape(-1, 7)
+
+    # Store vehicle data
+    vehicles = {
+        'num_vehicles': int(num_vehicles),
+        'capacity': int(capacity)
+    }
+
     return vehicles, customers
 
 
+def read_cached_instance(filename):
+    """
+    Vehicle data and customer rows from the compiled cache of an instance file, or None when the cache is
+    missing or older than the file.
+    """
+    cache_file = get_cache_file(filename)
+    try:
+        with np.load(cache_file) as cache:
+            source = os.stat(filename)
+            if cache['source_mtime'] != source.st_mtime_ns or cache['source_size'] != source.st_size:
+                return None
+            vehicles = {
+                'num_vehicles': int(cache['num_vehicles']),
+                'capacity': int(cache['capacity'])
+            }
+            return vehicles, cache['customers']
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_cached_instance(filename, vehicles, customers):
+    cache_file = get_cache_file(filename)
+    source = os.stat(filename)
+    temporary_file = f"{cache_file}.{os.getpid()}.tmp.npz"
+    try:
+        np.savez(temporary_file, num_vehicles=vehicles['num_vehicles'], capacity=vehicles['capacity'],
+                 customers=customers, source_mtime=source.st_mtime_ns, source_size=source.st_size)
+        os.replace(temporary_file, cache_file)
+    except OSError:
+        # A read-only data directory only costs the cache
+        print(f"Could not write instance cache {cache_file}.")
+
+
 def get_instance(instance) -> Instance:
-    vehicles, customers = parse_one_instance(instance)
+    """
+    Return the instance, parsing its file only the first time it is requested in this process.
+    """
+    filename = get_instance_file(instance)
+    if filename not in instances:
+        instances[filename] = load_instance(instance)
+    return instances[filename]
+
+
+def load_instance(instance) -> Instance:
+    filename = get_instance_file(instance)
+    cached = read_cached_instance(filename)
+    if cached is None:
+        vehicles, customers = parse_one_instance(instance)
+        if vehicles is None:
+            raise FileNotFoundError(filename)
+        write_cached_instance(filename, vehicles, customers)
+    else:
+        vehicles, customers = cached
+
     num_vehicles = vehicles['num_vehicles']
     capacity = vehicles['capacity']
-    id = [customer['CUST NO.'] for customer in customers]
-    locations = [(customer['XCOORD.'], customer['YCOORD.']) for customer in customers]
-    demand = [customer['DEMAND'] for customer in customers]
-    ready_time = [customer['READY TIME'] for customer in customers]
-    due_time = [customer['DUE DATE'] for customer in customers]
-    service_time = [customer['SERVICE TIME'] for customer in customers]
+    id = customers[:, 0].astype(np.int64)
+    locations = np.ascontiguousarray(customers[:, 1:3])
+    demand = np.ascontiguousarray(customers[:, 3])
+    ready_time = np.ascontiguousarray(customers[:, 4])
+    due_time = np.ascontiguousarray(customers[:, 5])
+    service_time = np.ascontiguousarray(customers[:, 6])
 
     data = Instance(
         instance=instance,
@@ -0,0 +1,77 @@
+import os
+from math import ceil, sqrt
+from pathlib import Path
+
+import numpy as np
+
+path_to_repo = Path(__file__).parent.parent.parent.resolve()  # This is the path to the repository
+path_to_generated = path_to_repo / "data" / "generated"
+
+# Scheduling horizon of a 100 by 100 grid and vehicle capacity of Solomon's series 1 ("tight") and series 2 ("wide")
+horizons = {"tight": {"C": 1236, "R": 230, "RC": 240}, "wide": {"C": 3390, "R": 1000, "RC": 960}}
+capacities = {"tight": 200, "wide": 1000}
+# Time window width as a fraction of the horizon
+window_widths = {"tight": (0.02, 0.1), "wide": (0.1, 0.3)}
+
+
+def customer_locations(rng, num_customers, instance_class, side):
+    """
+    Random ("R") customers spread uniformly over the grid, clustered ("C") customers around about one center per
+    ten customers, and half of each for the mixed class ("RC").
+    """
+    num_clustered = {"C": num_customers, "R": 0, "RC": num_customers // 2}[instance_class]
+    centers = rng.uniform(0.1 * side, 0.9 * side, (max(num_clustered // 10, 1), 2))
+    clustered = centers[rng.integers(len(centers), size=num_clustered)] + \
+        rng.normal(0, side / 40, (num_clustered, 2))
+    spread = rng.uniform(0, side, (num_customers - num_clustered, 2))
+    return np.clip(np.rint(np.vstack((clustered, spread))), 0, side)
+
+
+def generate_instance(num_customers, instance_class="R", windows="tight", seed=0, file_path=None):
+    """
+    Seeded Solomon-like instance with a depot in the middle of the grid, written in the VEHICLE/CUSTOMER format of
+    the Solomon files. Returns the path of the file, by default data/generated/<class><windows>_<customers>_<seed>.txt.
+    The grid grows with the square root of the number of customers and the horizon with it, so the routes of a
+    large instance look like those of a small one. Every customer can be served on its own route, and there are
+    enough vehicles for a quarter of the customers. That is too few routes for the random "feasible" start to find
+    a feasible solution, so solve generated instances from the "solomon" or "savings" start.
+    """
+    if instance_class not in ["C", "R", "RC"]:
+        raise ValueError("Instance class must be either 'C', 'R' or 'RC'")
+    if windows not in ["tight", "wide"]:
+        raise ValueError("Windows must be either 'tight' or 'wide'")
+    rng = np.random.default_rng(seed)
+    scale = sqrt(num_customers / 100)
+    side = round(100 * scale)
+    horizon = round(horizons[windows][instance_class] * scale)
+    depot = np.array([side // 2, side // 2])
+
+    locations = customer_locations(rng, num_customers, instance_class, side)
+    if instance_class == "C":
+        demand = 10 * rng.integers(1, 5, num_customers)
+        service_time = np.full(num_customers, 90)
+    else:
+        demand = rng.integers(1, 41, num_customers)
+        service_time = np.full(num_customers, 10)
+
+    # Window centers leave time to come from and go back to the depot
+    depot_distance = np.sqrt(((locations - depot) ** 2).sum(axis=1))
+    earliest = np.ceil(depot_distance)
+    latest = np.floor(horizon - depot_distance - service_time)
+    center = rng.uniform(earliest, latest)
+    width = rng.uniform(*window_widths[windows], num_customers) * horizon
+    ready_time = np.maximum(np.floor(center - width / 2), 0)
+    due_time = np.minimum(np.floor(center + width / 2), latest)
+
+    if file_path is None:
+        path_to_generated.mkdir(parents=True, exist_ok=True)
+        file_path = path_to_generated / f"{instance_class}{windows}_{num_customers}_{seed}.txt"
+    rows = np.column_stack((np.arange(1, num_customers + 1), locations, demand, ready_time, due_time, service_time))
+    with open(file_path, 'w') as file:
+        file.write("VEHICLE\nNUMBER     CAPACITY\n")
+        file.write(f"{ceil(num_customers / 4):>4}{capacities[windows]:>14}\n\n")
+        file.write("CUSTOMER\nCUST NO.  XCOORD.  YCOORD.  DEMAND  READY TIME  DUE DATE  SERVICE TIME\n\n")
+        file.write(f"{0:>5}{depot[0]:>8}{depot[1]:>9}{0:>9}{0:>10}{horizon:>12}{0:>9}\n")
+        for row in rows.astype(np.int64):
+            file.write(f"{row[0]:>5}{row[1]:>8}{row[2]:>9}{row[3]:>9}{row[4]:>10}{row[5]:>12}{row[6]:>9}\n")
+    return os.fspath(file_path)
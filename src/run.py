@@ -8,10 +8,10 @@ from src.simulatedAnnealing.simulatedAnnealing_soft_window import SimulatedAnnea
 path = Path(__file__).parent.resolve()
 sys.argv.append(str(path))
 from src.simulatedAnnealing.simulatedAnnealing import simulatedAnnealing, getSimulatedAnneling, SimulatedAnnealing
-from sklearn.model_selection import ParameterGrid
+from src.sweep import run_sweep
 
 
-def tune_parameters(dataset: int):
+def tune_parameters(dataset: int, seeds=(0,), workers=None):
     params = {
         'starting_method': ["feasible"],
         'initial_temperature': [0.1, 0.5, 1],
@@ -23,24 +23,11 @@ def tune_parameters(dataset: int):
         'neighborhood_selection': ["unroll", "1_opt", "2_opt"]
     }
 
-    # Run simulated annealing for all parameter combinations and store results
-    results = []
+    # Run simulated annealing for all parameter combinations and seeds in parallel and store results
+    return run_sweep(dataset, simulatedAnnealing, SimulatedAnnealing, params, seeds, workers, name="sweep_sa")
 
-    for param in ParameterGrid(params):
-        result = simulatedAnnealing(dataset, SimulatedAnnealing(**param))
-        results.append({
-            "start_method": param["starting_method"],
-            "neighborhood_definition": param["neighborhood_selection"],
-            "initial_temperature": param["initial_temperature"],
-            "final_temperature": param["final_temperature"],
-            "cooling_schedule": param["cooling_schedule"],
-            "alpha": param["alpha"],
-            "iterations": param["neighborhood_size"],
-            "result": result
-        })
 
-
-def tune_soft_parameters(dataset: int):
+def tune_soft_parameters(dataset: int, seeds=(0,), workers=None):
     params = {
         'starting_method': ["feasible"],
         'initial_temperature': [1],
@@ -55,21 +42,9 @@ def tune_soft_parameters(dataset: int):
         'total_penalty': [400, 500]
     }
 
-    # Run simulated annealing for all parameter combinations and store results
-    results = []
-
-    for param in ParameterGrid(params):
-        result = simulatedAnnealing_soft(dataset, SimulatedAnnealingSoft(**param))
-        results.append({
-            "start_method": param["starting_method"],
-            "neighborhood_definition": param["neighborhood_selection"],
-            "initial_temperature": param["initial_temperature"],
-            "final_temperature": param["final_temperature"],
-            "cooling_schedule": param["cooling_schedule"],
-            "alpha": param["alpha"],
-            "iterations": param["neighborhood_size"],
-            "result": result
-        })
+    # Run simulated annealing for all parameter combinations and seeds in parallel and store results
+    return run_sweep(dataset, simulatedAnnealing_soft, SimulatedAnnealingSoft, params, seeds, workers,
+                     name="sweep_sa_soft")
 
 
 def run(dataset: int):
@@ -0,0 +1,173 @@
+import numpy as np
+
+from src.simulatedAnnealing.calculations import acceptance_exponent
+from src.utils.events import count_infeasible
+from src.utils.giantTour import GiantTour
+
+
+class BatchedNeighborhood:
+    """
+    Draws a batch of candidate moves per SA step and scores them together with NumPy.
+    The solution is a GiantTour and the schedules of its routes are mirrored in padded arrays (one row per route),
+    so the distance delta and the time window and capacity feasibility of every candidate are computed with the
+    same constant-time formulas as RouteSchedules, without building any candidate route.
+    Moves are relocations of a customer to another route ("relocate") or exchanges of two customers between
+    routes ("swap"). The step takes the best feasible candidate ("best") or samples one with Boltzmann weights
+    ("boltzmann") and applies it to the tour, to be kept with accept() or reverted with reject().
+    A step has a fixed NumPy overhead of about 150 us, a few sequential neighbours, so batching pays off with
+    dozens of candidates: on generated R instances with 200 and 1000 tight customers a neighbour costs about 35 us
+    sequentially, 5 us with batches of 32 and 1.5 us with batches of 128.
+    """
+
+    def __init__(self, routes, schedules, data, distance_matrix, batch_size, move="relocate", selection="best"):
+        if move not in ["relocate", "swap"]:
+            raise ValueError("Batched move must be either 'relocate' or 'swap'")
+        if selection not in ["best", "boltzmann"]:
+            raise ValueError("Batch selection must be either 'best' or 'boltzmann'")
+        self.schedules = schedules
+        self.distance_matrix = distance_matrix
+        self.demand = np.asarray(data.demand)
+        self.capacity = data.capacity
+        self.ready_time = np.asarray(data.ready_time)
+        self.due_time = np.asarray(data.due_time)
+        self.service_time = np.asarray(data.service_time)
+        self.batch_size = batch_size
+        self.move = move
+        self.selection = selection
+
+        self.tour = GiantTour(routes, self.demand, distance_matrix)
+        self.allocate(max(len(route) for route in routes) + 8)
+
+    def allocate(self, width):
+        num_routes = self.tour.num_routes
+        self.width = width
+        self.departure = np.zeros((num_routes, width))
+        self.latest_start = np.full((num_routes, width), np.inf)
+        self.first_violation = np.zeros(num_routes, dtype=np.int64)
+        self.refresh(range(num_routes))
+
+    def refresh(self, route_indices):
+        """
+        Copy the schedules of the given routes of the tour into the padded arrays.
+        Only the routes of an accepted move are rebuilt, with RouteSchedules.build so that the arrays hold exactly
+        the times of the sequential feasibility checks.
+        """
+        for route_index in route_indices:
+            route = self.tour.route(route_index).tolist()
+            if len(route) > self.width:
+                self.allocate(len(route) + 8)
+                return
+            schedule = self.schedules.build(route)
+            self.departure[route_index, :len(route) - 1] = schedule.departure
+            self.latest_start[route_index, :len(route)] = schedule.latest_start
+            self.latest_start[route_index, len(route):] = np.inf
+            self.first_violation[route_index] = schedule.first_violation
+
+    def following(self, index):
+        # Clipped for candidates on empty routes, which are masked out as infeasible
+        return self.tour.tour[np.minimum(index + 1, len(self.tour.tour) - 1)]
+
+    def start_time(self, departure_time, travel_time, customer):
+        # Vectorized RouteSchedules.visit without the due time check, which the callers add to the feasibility mask
+        return np.maximum(departure_time + travel_time, self.ready_time[customer])
+
+    def replacement(self, route, position, index, customer):
+        """
+        Distance delta and feasibility of replacing the customer at index (position of each route) by customer.
+        """
+        previous = self.tour.tour[index - 1]
+        replaced = self.tour.tour[index]
+        following = self.following(index)
+        arrival = self.distance_matrix[previous, customer]
+        leave = self.distance_matrix[customer, following]
+        delta = arrival + leave - self.distance_matrix[previous, replaced] - self.distance_matrix[replaced, following]
+        start_time = self.start_time(self.departure[route, position - 1], arrival, customer)
+        feasible = (position - 1 < self.first_violation[route]) & \
+            (self.tour.loads[route] - self.demand[replaced] + self.demand[customer] <= self.capacity) & \
+            (start_time <= self.due_time[customer]) & \
+            (start_time + self.service_time[customer] + leave <= self.latest_start[route, position + 1])
+        return delta, feasible
+
+    def evaluate_relocations(self, route1, position1, route2, position2):
+        index1 = self.tour.offsets[route1] + position1
+        index2 = self.tour.offsets[route2] + position2
+        customer = self.tour.tour[index1]
+        previous1 = self.tour.tour[index1 - 1]
+        following1 = self.following(index1)
+        previous2 = self.tour.tour[index2 - 1]
+        following2 = self.tour.tour[index2]
+        bypass = self.distance_matrix[previous1, following1]
+        arrival = self.distance_matrix[previous2, customer]
+        leave = self.distance_matrix[customer, following2]
+        delta = bypass - self.distance_matrix[previous1, customer] - self.distance_matrix[customer, following1] + \
+            arrival + leave - self.distance_matrix[previous2, following2]
+
+        removable = (position1 - 1 < self.first_violation[route1]) & \
+            (self.tour.loads[route1] - self.demand[customer] <= self.capacity) & \
+            (self.departure[route1, position1 - 1] + bypass <= self.latest_start[route1, position1 + 1])
+        start_time = self.start_time(self.departure[route2, position2 - 1], arrival, customer)
+        insertable = (position2 - 1 < self.first_violation[route2]) & \
+            (self.tour.loads[route2] + self.demand[customer] <= self.capacity) & \
+            (start_time <= self.due_time[customer]) & \
+            (start_time + self.service_time[customer] + leave <= self.latest_start[route2, position2])
+        return delta, removable & insertable
+
+    def evaluate_swaps(self, route1, position1, route2, position2):
+        index1 = self.tour.offsets[route1] + position1
+        index2 = self.tour.offsets[route2] + position2
+        customer1 = self.tour.tour[index1]
+        customer2 = self.tour.tour[index2]
+        delta1, feasible1 = self.replacement(route1, position1, index1, customer2)
+        delta2, feasible2 = self.replacement(route2, position2, index2, customer1)
+        return delta1 + delta2, feasible1 & feasible2
+
+    def propose(self, temperature, k):
+        """
+        Score a batch of candidate moves and apply the selected one to the tour.
+        Returns the change in total distance (0 if no candidate is feasible, and nothing is applied).
+        """
+        num_routes = self.tour.num_routes
+        if num_routes < 2:
+            return 0
+
+        # Two different random routes and a random customer position in each (insertion position in route2),
+        # drawn from uniform floats since np.random.randint costs more than the evaluation of a small batch
+        draws = np.random.random((4, self.batch_size))
+        route1 = (draws[0] * num_routes).astype(np.int64)
+        route2 = (route1 + 1 + (draws[1] * (num_routes - 1)).astype(np.int64)) % num_routes
+        lengths = self.tour.offsets[1:] - self.tour.offsets[:-1]
+        customers1 = lengths[route1] - 2
+        customers2 = lengths[route2] - 2
+        position1 = 1 + (draws[2] * np.maximum(customers1, 1)).astype(np.int64)
+        if self.move == "relocate":
+            position2 = 1 + (draws[3] * (customers2 + 1)).astype(np.int64)
+            delta, feasible = self.evaluate_relocations(route1, position1, route2, position2)
+        else:
+            position2 = 1 + (draws[3] * np.maximum(customers2, 1)).astype(np.int64)
+            delta, feasible = self.evaluate_swaps(route1, position1, route2, position2)
+        # Both routes need a customer, like the sequential operators
+        feasible &= (customers1 > 0) & (customers2 > 0)
+
+        count_infeasible(f"batch_{self.move}", int(self.batch_size - feasible.sum()))
+        candidates = feasible.nonzero()[0]
+        if len(candidates) == 0:
+            return 0
+
+        if self.selection == "best":
+            chosen = candidates[np.argmin(delta[candidates])]
+        else:
+            exponents = acceptance_exponent(delta[candidates], temperature, k)
+            weights = np.exp(exponents - exponents.max())
+            chosen = candidates[np.searchsorted(np.cumsum(weights), np.random.random() * weights.sum())]
+
+        apply_move = self.tour.relocate if self.move == "relocate" else self.tour.swap
+        apply_move(int(route1[chosen]), int(position1[chosen]), int(route2[chosen]), int(position2[chosen]))
+        return float(delta[chosen])
+
+    def accept(self):
+        touched_routes = self.tour.touched_routes()
+        self.tour.commit()
+        self.refresh(touched_routes)
+
+    def reject(self):
+        self.tour.undo()
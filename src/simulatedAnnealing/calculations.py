@@ -1,24 +1,145 @@
+import hashlib
+import os
 import random
+import tempfile
 from math import ceil
+from pathlib import Path
 
 import numpy as np
 
-from src.instance.instance import get_instance
+from src.instance.instance import get_instance, get_instance_file
 from src.utils.feasibilityCheck import is_feasible
 
+path_to_cache = Path(__file__).parent.parent.parent.resolve() / "cache"  # This is the path to the matrix cache
+
+# Distance matrices already loaded in this process, keyed by instance file
+distance_matrices = {}
+
+# Nearest neighbour lists already computed in this process, keyed by instance file and number of neighbours
+neighbor_lists = {}
+
 
 def calculate_distance_matrix(locations):
-    num_locations = len(locations)
-    distance_matrix = np.zeros((num_locations, num_locations))
+    """
+    Euclidean distance between every pair of locations, which is also the travel time between them.
+    """
+    coordinates = np.asarray(locations, dtype=float)
+    delta_x = coordinates[:, 0, np.newaxis] - coordinates[np.newaxis, :, 0]
+    delta_y = coordinates[:, 1, np.newaxis] - coordinates[np.newaxis, :, 1]
+
+    return np.sqrt(delta_x ** 2 + delta_y ** 2)
+
+
+def hash_instance_file(filename):
+    with open(filename, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()[:16]
+
+
+def get_distance_matrix(instance):
+    """
+    Distance matrix of an instance, computed at most once per instance file.
+    The matrix is stored in the cache directory as a .npy file named after a hash of the instance file and is
+    memory-mapped read-only, so repeated solves and other processes share it without copying.
+    """
+    filename = str(get_instance_file(instance))
+    if filename in distance_matrices:
+        return distance_matrices[filename]
 
-    for i in range(num_locations):
-        for j in range(num_locations):
-            distance_matrix[i, j] = np.sqrt(
-                (locations[i][0] - locations[j][0]) ** 2 + (locations[i][1] - locations[j][1]) ** 2)
+    cache_file = path_to_cache / f"distance_matrix_{hash_instance_file(filename)}.npy"
+    if not cache_file.exists():
+        distance_matrix = calculate_distance_matrix(get_instance(instance).locations)
+        path_to_cache.mkdir(parents=True, exist_ok=True)
 
+        # Write to a temporary file first so that concurrent workers never read a partial matrix
+        with tempfile.NamedTemporaryFile(dir=path_to_cache, suffix=".npy", delete=False) as file:
+            np.save(file, distance_matrix)
+        os.replace(file.name, cache_file)
+
+    distance_matrix = np.asarray(np.load(cache_file, mmap_mode='r'))
+    distance_matrices[filename] = distance_matrix
     return distance_matrix
 
 
+def calculate_neighbor_lists(distance_matrix, k):
+    """
+    The k nearest customers of every node, nearest first, never the node itself or the depot.
+    Rows of the distance matrix are processed in blocks so that large instances are never copied whole.
+    """
+    num_nodes = len(distance_matrix)
+    k = min(k, num_nodes - 2)
+    neighbors = np.empty((num_nodes, k), dtype=np.int64)
+    for start in range(0, num_nodes, 1024):
+        end = min(start + 1024, num_nodes)
+        distances = np.array(distance_matrix[start:end])
+        distances[:, 0] = np.inf
+        distances[np.arange(end - start), np.arange(start, end)] = np.inf
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1)
+        neighbors[start:end] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+
+def get_neighbor_lists(instance, k):
+    """
+    Nearest neighbour lists of an instance, computed at most once per instance file and k.
+    """
+    key = (str(get_instance_file(instance)), k)
+    if key not in neighbor_lists:
+        neighbor_lists[key] = calculate_neighbor_lists(get_distance_matrix(instance), k).tolist()
+    return neighbor_lists[key]
+
+
+def locate_customer(routes, customer, schedules=None):
+    """
+    Index of the route that visits customer and the position of the customer in it. With the RouteSchedules of the
+    routes it is looked up in their index instead of searching every route.
+    """
+    if schedules is not None:
+        location = schedules.locate(routes, customer)
+        if location is not None:
+            return location
+    for route_index, route in enumerate(routes):
+        if customer in route:
+            return route_index, route.index(customer)
+
+
+def select_granular_relocation(routes, neighbors, schedules=None):
+    """
+    Granular relocation: a random customer goes next to one of its nearest neighbours, in front of it or behind it.
+    Returns the route and position of the customer and the route and insertion position, or None when the
+    customer cannot move or the neighbour is on the same route. The neighbour is found with locate_customer.
+    """
+    route1_index = random.randrange(len(routes))
+    route1 = routes[route1_index]
+    if len(route1) <= 2:
+        return None
+    customer_index = random.randint(1, len(route1) - 2)
+    neighbor = random.choice(neighbors[route1[customer_index]])
+    route2_index, neighbor_index = locate_customer(routes, neighbor, schedules)
+    if route2_index == route1_index:
+        return None
+    return route1_index, customer_index, route2_index, neighbor_index + random.randint(0, 1)
+
+
+def select_granular_exchange(routes, neighbors, schedules=None):
+    """
+    Granular exchange: a random customer swaps places with the customer in front of or behind one of its nearest
+    neighbours. Returns the routes and positions of both customers, or None when there is no such pair of customers
+    on two different routes. The neighbour is found with locate_customer.
+    """
+    route1_index = random.randrange(len(routes))
+    route1 = routes[route1_index]
+    if len(route1) <= 2:
+        return None
+    customer1_index = random.randint(1, len(route1) - 2)
+    neighbor = random.choice(neighbors[route1[customer1_index]])
+    route2_index, neighbor_index = locate_customer(routes, neighbor, schedules)
+    customer2_index = neighbor_index + random.choice((-1, 1))
+    if route2_index == route1_index or customer2_index == 0 or customer2_index == len(routes[route2_index]) - 1:
+        return None
+    return route1_index, customer1_index, route2_index, customer2_index
+
+
 def calculate_route_distance(route, distance_matrix):
     length = 0
     for i in range(1, len(route)):
@@ -35,14 +156,66 @@ def calculate_total_distance(routes, distance_matrix):
     return total_distance
 
 
-def create_feasible_initial_solution(instance, num_routes):
-    random.seed(0)
+def acceptance_exponent(delta, temperature, k):
+    """
+    Exponent of the probability with which SA accepts a move that changes the distance by delta.
+    """
+    return -delta / (k * temperature)
+
+
+def removal_delta(route, position, distance_matrix):
+    """
+    Change in the length of a route when the customer at position is removed from it.
+    """
+    previous, customer, following = route[position - 1], route[position], route[position + 1]
+    return (distance_matrix[previous, following] - distance_matrix[previous, customer]
+            - distance_matrix[customer, following])
+
+
+def insertion_delta(route, position, customer, distance_matrix):
+    """
+    Change in the length of a route when customer is inserted in front of the node at position.
+    """
+    previous, following = route[position - 1], route[position]
+    return (distance_matrix[previous, customer] + distance_matrix[customer, following]
+            - distance_matrix[previous, following])
+
+
+def replacement_delta(route, position, customer, distance_matrix):
+    """
+    Change in the length of a route when the node at position is replaced by customer.
+    """
+    previous, replaced = route[position - 1], route[position]
+    delta = distance_matrix[previous, customer] - distance_matrix[previous, replaced]
+    if position + 1 < len(route):
+        following = route[position + 1]
+        delta += distance_matrix[customer, following] - distance_matrix[replaced, following]
+    return delta
+
+
+def adjacent_swap_delta(route, position, distance_matrix):
+    """
+    Change in the length of a route when the nodes at position and position + 1 swap places.
+    """
+    previous, first, second, following = route[position - 1], route[position], route[position + 1], \
+        route[position + 2]
+    return (distance_matrix[previous, second] + distance_matrix[second, first] + distance_matrix[first, following]
+            - distance_matrix[previous, first] - distance_matrix[first, second] - distance_matrix[second, following])
+
+
+def create_feasible_initial_solution(instance, num_routes, seed=0, max_attempts=5_000_000):
+    """
+    Random feasible start: the customers are shuffled and cut into num_routes routes of equal length until every
+    route is feasible. The chance of that falls steeply with the number of customers per route, so instances with
+    few vehicles, such as the generated ones, may never get there. Raises ValueError after max_attempts shuffles.
+    """
+    random.seed(seed)
     data = get_instance(instance)
     num_customers = len(data.id) - 1
 
     # Convert customers data into a list of dictionaries for easier manipulation
     customers_list = [
-        {'id': data.id[i], 'location': data.locations[i], 'demand': data.demand[i],
+        {'id': int(data.id[i]), 'location': data.locations[i], 'demand': data.demand[i],
          'ready_time': data.ready_time[i], 'due_time': data.due_time[i],
          'service_time': data.service_time[i]} for i in range(1, num_customers + 1)
     ]
@@ -53,11 +226,10 @@ def create_feasible_initial_solution(instance, num_routes):
     # Extract sorted IDs for route creation
     sorted_ids = [customer['id'] for customer in sorted_customers_by_ready_time]
 
-    # Distance matrix (assuming it's available)
-    distance_matrix = calculate_distance_matrix(data.locations)
+    distance_matrix = get_distance_matrix(instance)
     n_customers_per_route = ceil(num_customers / num_routes)
 
-    while True:
+    for _ in range(max_attempts):
         # Shuffle sorted IDs to randomize selection
         random.shuffle(sorted_ids)
 
@@ -80,6 +252,9 @@ def create_feasible_initial_solution(instance, num_routes):
         # Check if all customers are included exactly once
         if len(routes) == ceil(num_customers / n_customers_per_route):
             break  # Break if feasible solution is found
+    else:
+        raise ValueError(f"No feasible random start with {num_routes} routes after {max_attempts} attempts, "
+                         f"start from 'solomon' or 'savings' instead")
 
     # Output the initial solution
     print(f"Initial solution: {routes}")
@@ -1,10 +1,124 @@
+from datetime import datetime
+from math import ceil, log
+
+
 def CS_geometric(current_temperature, alpha):
     current_temperature *= alpha
     return current_temperature
 
 
-def reduce_temperature(current_temperature, sa):
-    if sa.cooling_schedule == "geometric":
-        current_temperature = CS_geometric(current_temperature, sa.alpha)
+def CS_cauchy(initial_temperature, step, rate):
+    return initial_temperature / (1 + rate * step)
 
-    return current_temperature
+
+def CS_logarithmic(initial_temperature, step, rate):
+    return initial_temperature / (1 + rate * log(1 + step))
+
+
+def CS_geometricMomentum(current_temperature, velocity, alpha, momentum):
+    # Each drop keeps part of the previous one, so cooling speeds up; at most two geometric steps at once
+    velocity = momentum * velocity + (1 - alpha) * current_temperature
+    return max(current_temperature - velocity, alpha ** 2 * current_temperature), velocity
+
+
+def calibrate_temperatures(deltas, k, initial_acceptance, final_acceptance):
+    """
+    Initial temperature at which the mean uphill move of a sample of move deltas is accepted with probability
+    initial_acceptance, and final temperature at which even the smallest one is accepted with probability
+    final_acceptance. Returns None when the sample has no uphill move.
+    """
+    uphill_deltas = [delta for delta in deltas if delta > 0]
+    if not uphill_deltas:
+        return None
+    mean_delta = sum(uphill_deltas) / len(uphill_deltas)
+    return -mean_delta / (k * log(initial_acceptance)), -min(uphill_deltas) / (k * log(final_acceptance))
+
+
+def exhausted_budget(sa, start_time, evaluations, evaluations_since_improvement):
+    """
+    Name of the first budget of the SA configuration that is used up, or None while the search may go on.
+    """
+    if sa.time_limit is not None and datetime.now().timestamp() - start_time >= sa.time_limit:
+        return "time_limit"
+    if sa.max_evaluations is not None and evaluations >= sa.max_evaluations:
+        return "max_evaluations"
+    if sa.patience is not None and evaluations_since_improvement >= sa.patience:
+        return "patience"
+    return None
+
+
+class CoolingSchedule:
+    """
+    Temperature of one SA run, lowered by reduce_temperature after every neighborhood_size proposals.
+    cauchy and logarithmic are scaled to reach the final temperature after as many steps as geometric takes.
+    adaptive cools geometrically, twice as fast while the acceptance rate of uphill moves is above its target and
+    half as fast while it is below. The target falls linearly in log-temperature from target_acceptance at the
+    initial temperature to 0 at the final one, and stays at target_acceptance if the initial temperature is not
+    above the final one. After reheat_patience steps without a new best solution, the temperature goes back up to
+    where the best was last improved, at most max_reheats times.
+    """
+
+    def __init__(self, sa, initial_temperature, final_temperature):
+        self.sa = sa
+        self.initial_temperature = initial_temperature
+        self.final_temperature = final_temperature
+        self.steps = max(1, ceil(log(final_temperature / initial_temperature) / log(sa.alpha)))
+        self.step = 0
+        self.velocity = 0.0
+        self.uphill_proposals = 0
+        self.uphill_accepts = 0
+        self.improved = False
+        self.improvement_temperature = initial_temperature
+        self.steps_without_improvement = 0
+        self.reheats = 0
+
+    def record(self, delta, accepted):
+        if delta > 0:
+            self.uphill_proposals += 1
+            self.uphill_accepts += accepted
+
+    def record_improvement(self, current_temperature):
+        self.improved = True
+        self.improvement_temperature = current_temperature
+
+    def target_acceptance(self, current_temperature):
+        if self.initial_temperature <= self.final_temperature:
+            # No temperature range to fall over, the target stays constant
+            return self.sa.target_acceptance
+        progress = log(current_temperature / self.final_temperature) / \
+            log(self.initial_temperature / self.final_temperature)
+        return self.sa.target_acceptance * min(max(progress, 0), 1)
+
+    def reduce_temperature(self, current_temperature):
+        self.step += 1
+        sa = self.sa
+        if sa.cooling_schedule == "geometric":
+            return CS_geometric(current_temperature, sa.alpha)
+        if sa.cooling_schedule == "cauchy":
+            rate = (self.initial_temperature / self.final_temperature - 1) / self.steps
+            return CS_cauchy(self.initial_temperature, self.step, rate)
+        if sa.cooling_schedule == "logarithmic":
+            rate = (self.initial_temperature / self.final_temperature - 1) / log(1 + self.steps)
+            return CS_logarithmic(self.initial_temperature, self.step, rate)
+        if sa.cooling_schedule == "geometricMomentum":
+            current_temperature, self.velocity = CS_geometricMomentum(current_temperature, self.velocity, sa.alpha,
+                                                                      sa.momentum)
+            return current_temperature
+        return self.adapt(current_temperature)
+
+    def adapt(self, current_temperature):
+        alpha = self.sa.alpha
+        if self.uphill_proposals:
+            rate = self.uphill_accepts / self.uphill_proposals
+            alpha = alpha ** 2 if rate > self.target_acceptance(current_temperature) else alpha ** 0.5
+        self.uphill_proposals = 0
+        self.uphill_accepts = 0
+
+        self.steps_without_improvement = 0 if self.improved else self.steps_without_improvement + 1
+        self.improved = False
+        current_temperature = CS_geometric(current_temperature, alpha)
+        if self.steps_without_improvement >= self.sa.reheat_patience and self.reheats < self.sa.max_reheats:
+            current_temperature = max(current_temperature, self.improvement_temperature)
+            self.steps_without_improvement = 0
+            self.reheats += 1
+        return current_temperature
@@ -1,59 +1,109 @@
 import random
 
+from src.simulatedAnnealing.calculations import removal_delta, insertion_delta, replacement_delta, \
+    select_granular_relocation, select_granular_exchange
+from src.utils.events import logger, count_infeasible
 from src.utils.feasibilityCheck import is_feasible
 
 
-def one_opt_operator(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Applying 1-Opt operator.")
+def one_opt_operator(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix, schedules=None,
+                     neighbors=None):
+    """
+    Move a random customer to a random position of another route.
+    Returns the routes and the change in total distance, which is 0 when the move is not applied.
+    With the RouteSchedules of the routes, feasibility is checked in constant time.
+    With nearest neighbour lists, the customer is moved next to one of its neighbours instead.
+    """
+    logger.debug("Applying 1-Opt operator.")
     num_routes = len(routes)
 
-    # Select two different random routes
-    route_indices = random.sample(range(num_routes), 2)
-    route1_index, route2_index = route_indices[0], route_indices[1]
-    route1, route2 = routes[route1_index], routes[route2_index]
-
-    # Ensure both routes have more than two nodes (excluding depots)
-    if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply 1-Opt.")
-        return routes
-
-    # Randomly select a customer (excluding depot) to move from route1 to route2
-    customer_index = random.randint(1, len(route1) - 2)
+    if neighbors is not None:
+        move = select_granular_relocation(routes, neighbors, schedules)
+        if move is None:
+            logger.debug("No neighbour on another route to apply 1-Opt.")
+            return routes, 0
+        route1_index, customer_index, route2_index, insert_index = move
+        route1, route2 = routes[route1_index], routes[route2_index]
+    else:
+        if num_routes < 2:
+            logger.debug("A single route, nothing to apply 1-Opt to.")
+            return routes, 0
+
+        # Select two different random routes
+        route_indices = random.sample(range(num_routes), 2)
+        route1_index, route2_index = route_indices[0], route_indices[1]
+        route1, route2 = routes[route1_index], routes[route2_index]
+
+        # Ensure both routes have more than two nodes (excluding depots)
+        if len(route1) <= 2 or len(route2) <= 2:
+            logger.debug("Routes are too short to apply 1-Opt.")
+            return routes, 0
+
+        # Randomly select a customer (excluding depot) to move from route1 to a random position of route2
+        customer_index = random.randint(1, len(route1) - 2)
+        insert_index = random.randint(1, len(route2) - 1)
     customer = route1[customer_index]
 
     # Create new routes for feasibility check
     new_route1 = route1[:customer_index] + route1[customer_index + 1:]
-    new_route2 = route2[:]
-    new_route2.insert(random.randint(1, len(new_route2) - 1), customer)
+    new_route2 = route2[:insert_index] + [customer] + route2[insert_index:]
 
     # Check if the new routes are feasible
-    if is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
-       is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+    if schedules is not None:
+        feasible = schedules.can_remove(route1_index, route1, customer_index) and \
+            schedules.can_insert(route2_index, route2, insert_index, customer)
+    else:
+        feasible = is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
+            is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix)
+    if feasible:
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(f"1-Opt operator applied successfully. Moved customer {customer} from route {route1_index} to route {route2_index}.")
+        logger.debug("1-Opt operator applied successfully. Moved customer %s from route %s to route %s.", customer,
+                     route1_index, route2_index)
+        return routes, removal_delta(route1, customer_index, distance_matrix) + \
+            insertion_delta(route2, insert_index, customer, distance_matrix)
     else:
-        print(f"1-Opt operator resulted in infeasible routes. Reverting.")
+        logger.debug("1-Opt operator resulted in infeasible routes. Reverting.")
+        count_infeasible("1_opt")
 
-    return routes
+    return routes, 0
 
 
-def two_opt_operator(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Applying 2-Opt operator.")
+def two_opt_operator(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix, schedules=None,
+                     neighbors=None):
+    """
+    Swap two random customers between two routes.
+    Returns the routes and the change in total distance, which is 0 when the move is not applied.
+    With the RouteSchedules of the routes, feasibility is checked in constant time.
+    With nearest neighbour lists, the customer swaps with one next to one of its neighbours instead.
+    """
+    logger.debug("Applying 2-Opt operator.")
     num_routes = len(routes)
 
-    # Select two different random routes
-    route_indices = random.sample(range(num_routes), 2)
-    route1_index, route2_index = route_indices[0], route_indices[1]
-    route1, route2 = routes[route1_index], routes[route2_index]
+    if neighbors is not None:
+        move = select_granular_exchange(routes, neighbors, schedules)
+        if move is None:
+            logger.debug("No neighbour on another route to apply 2-Opt.")
+            return routes, 0
+        route1_index, customer1_index, route2_index, customer2_index = move
+        route1, route2 = routes[route1_index], routes[route2_index]
+    else:
+        if num_routes < 2:
+            logger.debug("A single route, nothing to apply 2-Opt to.")
+            return routes, 0
+
+        # Select two different random routes
+        route_indices = random.sample(range(num_routes), 2)
+        route1_index, route2_index = route_indices[0], route_indices[1]
+        route1, route2 = routes[route1_index], routes[route2_index]
 
-    # Randomly select two different customers (excluding depot) to swap between routes
-    if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply 2-Opt.")
-        return routes
+        # Randomly select two different customers (excluding depot) to swap between routes
+        if len(route1) <= 2 or len(route2) <= 2:
+            logger.debug("Routes are too short to apply 2-Opt.")
+            return routes, 0
 
-    customer_indices = random.sample(range(1, len(route1) - 1), 2)
-    customer1_index, customer2_index = customer_indices[0], customer_indices[1]
+        customer1_index = random.randint(1, len(route1) - 2)
+        customer2_index = random.randint(1, len(route2) - 2)
 
     customer1 = route1[customer1_index]
     customer2 = route2[customer2_index]
@@ -63,15 +113,23 @@ def two_opt_operator(routes, demand, capacity, ready_time, due_time, service_tim
     new_route2 = route2[:customer2_index] + [customer1] + route2[customer2_index + 1:]
 
     # Check feasibility of new routes
-    if is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
-            is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+    if schedules is not None:
+        feasible = schedules.can_replace(route1_index, route1, customer1_index, customer2) and \
+            schedules.can_replace(route2_index, route2, customer2_index, customer1)
+    else:
+        feasible = is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
+            is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix)
+    if feasible:
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(f"2-Opt operator applied successfully.")
+        logger.debug("2-Opt operator applied successfully.")
+        return routes, replacement_delta(route1, customer1_index, customer2, distance_matrix) + \
+            replacement_delta(route2, customer2_index, customer1, distance_matrix)
     else:
-        print(f"2-Opt operator resulted in infeasible routes. Reverting.")
+        logger.debug("2-Opt operator resulted in infeasible routes. Reverting.")
+        count_infeasible("2_opt")
 
-    return routes
+    return routes, 0
 
 
 
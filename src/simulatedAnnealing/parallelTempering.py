@@ -0,0 +1,243 @@
+import random
+import traceback
+from dataclasses import asdict
+from datetime import datetime
+from math import ceil, exp, log
+from multiprocessing import Pipe, Process
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing.calculations import calculate_total_distance, get_distance_matrix, acceptance_exponent, \
+    get_neighbor_lists
+from src.simulatedAnnealing.simulatedAnnealing import SimulatedAnnealing, getSimulatedAnneling, propose_move, \
+    create_initial_routes, calibrate_sa_temperatures
+from src.sweep import share_instance, attach_shared_instance
+from src.utils.events import logger, start_run
+from src.utils.feasibilityCheck import RouteSchedules
+from src.utils.save import save_sa_data_and_solution
+from src.utils.solution import createSolution
+
+
+def temperature_ladder(initial_temperature, final_temperature, num_replicas):
+    """
+    Geometrically spaced temperatures from initial_temperature to final_temperature, one per replica.
+    """
+    if num_replicas == 1:
+        return [initial_temperature]
+    ratio = (final_temperature / initial_temperature) ** (1 / (num_replicas - 1))
+    return [initial_temperature * ratio ** i for i in range(num_replicas)]
+
+
+class Replica:
+    """
+    State of one chain of the replica exchange: its routes with their schedules, the best routes it visited and
+    its own random state, kept by a replica worker for the whole run.
+    """
+
+    def __init__(self, routes, distance, data, distance_matrix, seed):
+        self.routes, self.distance = routes, distance
+        self.best_routes, self.best_distance = routes, distance
+        self.schedules = RouteSchedules(routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                        data.service_time, distance_matrix)
+        random.seed(seed)
+        self.random_state = random.getstate()
+
+    def run(self, sa, data, distance_matrix, neighbors, temperature, steps):
+        """
+        Metropolis steps at a fixed temperature with the SA neighborhood operators. Returns whether the best
+        distance of the replica improved and the counters of the segment.
+        """
+        random.setstate(self.random_state)
+        stats = start_run()
+        best_distance = self.best_distance
+        for _ in range(steps):
+            stats.proposals += 1
+            new_routes, delta_distance = propose_move(self.routes, data, distance_matrix, self.schedules,
+                                                      sa.neighborhood_selection, neighbors)
+            if delta_distance < 0:
+                stats.improving_accepts += 1
+            elif random.random() < exp(min(0, acceptance_exponent(delta_distance, temperature, sa.constant_k))):
+                if delta_distance > 0:
+                    stats.uphill_accepts += 1
+                else:
+                    stats.neutral_moves += 1
+            else:
+                stats.uphill_rejects += 1
+                continue
+            self.routes, self.distance = new_routes, self.distance + delta_distance
+            self.schedules.update(self.routes)
+            if self.distance < self.best_distance:
+                self.best_routes, self.best_distance = self.routes, self.distance
+        self.random_state = random.getstate()
+        return self.best_distance < best_distance, stats
+
+
+def replica_worker(connection, descriptor, sa, initial_routes, initial_distance, seeds):
+    """
+    Process that keeps the replicas with the given seeds, by replica index, for the whole run. It receives the
+    temperature of each of them and the number of steps of a segment, and sends back their distances, their best
+    distances and routes when these improved, and the counters of the segment. Only temperatures and energies
+    cross the process boundary between exchanges.
+    """
+    try:
+        attach_shared_instance(descriptor)
+        dataset = descriptor["dataset"]
+        data = get_instance(dataset)
+        distance_matrix = get_distance_matrix(dataset)
+        neighbors = get_neighbor_lists(dataset, sa.granular_neighbors) if sa.granular_neighbors else None
+        replicas = {replica: Replica(initial_routes, initial_distance, data, distance_matrix, seed)
+                    for replica, seed in seeds.items()}
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            replica_temperatures, steps = message
+            results = []
+            for replica, temperature in replica_temperatures.items():
+                improved, stats = replicas[replica].run(sa, data, distance_matrix, neighbors, temperature, steps)
+                results.append((replica, replicas[replica].distance, replicas[replica].best_distance,
+                                replicas[replica].best_routes if improved else None, asdict(stats)))
+            connection.send(results)
+    except EOFError:
+        # The run was stopped by an error in another worker
+        pass
+    except Exception:
+        connection.send(traceback.format_exc())
+    finally:
+        connection.close()
+
+
+def parallelTempering(dataset, sa: SimulatedAnnealing, num_replicas=4, exchange_interval=100, rounds=None,
+                      target_distance=None, workers=None):
+    """
+    Replica exchange: num_replicas SA chains run in worker processes at fixed temperatures spaced between the
+    initial and final temperature of sa. The workers keep their replicas for the whole run; every
+    exchange_interval steps the replicas at neighbouring temperatures swap temperatures with the Metropolis
+    exchange probability, alternating even and odd pairs. By default every chain makes as many steps as one
+    simulatedAnnealing run with the same parameters, and the search stops early once the best distance reaches
+    target_distance.
+    """
+    startSearchClock = datetime.now().timestamp()
+    # The calibration moves draw from random, the replicas reseed it with their own seeds
+    random.seed(sa.seed)
+    data = get_instance(dataset)
+    distance_matrix = get_distance_matrix(dataset)
+    initial_routes = create_initial_routes(dataset, sa, data.num_vehicles)
+    initial_distance = calculate_total_distance(initial_routes, distance_matrix)
+    print(f"Initial distance: {round(initial_distance)}")
+
+    initial_temperature, final_temperature = initial_distance * sa.initial_temperature, sa.final_temperature
+    if sa.calibrate:
+        schedules = RouteSchedules(initial_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                   data.service_time, distance_matrix)
+        neighbors = get_neighbor_lists(dataset, sa.granular_neighbors) if sa.granular_neighbors else None
+        calibration = calibrate_sa_temperatures(initial_routes, data, distance_matrix, schedules, sa, neighbors)
+        if calibration is not None:
+            initial_temperature, final_temperature = calibration
+    temperatures = temperature_ladder(initial_temperature, final_temperature, num_replicas)
+    if rounds is None:
+        # As many steps as the geometric schedule of simulatedAnnealing makes to cool down, none when the initial
+        # temperature is not above the final one
+        cooling_steps = max(0, ceil(log(final_temperature / temperatures[0]) / log(sa.alpha)))
+        rounds = ceil(cooling_steps * sa.neighborhood_size / exchange_interval)
+    workers = min(workers or num_replicas, num_replicas)
+
+    # Replica at every temperature of the ladder, hottest first
+    ladder = list(range(num_replicas))
+    distances = [initial_distance] * num_replicas
+    best_routes, best_distance = initial_routes, initial_distance
+    swap_attempts = [0] * (num_replicas - 1)
+    swap_accepts = [0] * (num_replicas - 1)
+    solutions = []
+    stats = start_run()
+    rng = random.Random(sa.seed)
+    completed_rounds = 0
+
+    blocks, descriptor = share_instance(dataset)
+    connections, processes = [], []
+    try:
+        for worker in range(workers):
+            connection, worker_connection = Pipe()
+            seeds = {replica: sa.seed * num_replicas + replica for replica in range(worker, num_replicas, workers)}
+            process = Process(target=replica_worker, daemon=True,
+                              args=(worker_connection, descriptor, sa, initial_routes, initial_distance, seeds))
+            process.start()
+            worker_connection.close()
+            connections.append(connection)
+            processes.append(process)
+
+        for round_index in range(rounds):
+            replica_temperatures = {replica: temperature for temperature, replica in zip(temperatures, ladder)}
+            for worker, connection in enumerate(connections):
+                connection.send(({replica: replica_temperatures[replica]
+                                  for replica in range(worker, num_replicas, workers)}, exchange_interval))
+            for connection in connections:
+                results = connection.recv()
+                if isinstance(results, str):
+                    raise RuntimeError(f"Replica worker failed:\n{results}")
+                for replica, distance, replica_best_distance, replica_best_routes, replica_stats in results:
+                    distances[replica] = distance
+                    if replica_best_routes is not None and replica_best_distance < best_distance:
+                        best_routes, best_distance = replica_best_routes, replica_best_distance
+                    stats.proposals += replica_stats["proposals"]
+                    stats.improving_accepts += replica_stats["improving_accepts"]
+                    stats.uphill_accepts += replica_stats["uphill_accepts"]
+                    stats.uphill_rejects += replica_stats["uphill_rejects"]
+                    stats.neutral_moves += replica_stats["neutral_moves"]
+                    for operator, count in replica_stats["infeasible_rejects"].items():
+                        stats.infeasible_rejects[operator] = stats.infeasible_rejects.get(operator, 0) + count
+            solutions.append(best_distance)
+            completed_rounds = round_index + 1
+
+            # Propose swaps between neighbouring temperatures, even pairs on even rounds and odd pairs otherwise
+            for i in range(round_index % 2, num_replicas - 1, 2):
+                distance_i, distance_j = distances[ladder[i]], distances[ladder[i + 1]]
+                exponent = acceptance_exponent(distance_j - distance_i, temperatures[i], sa.constant_k) + \
+                    acceptance_exponent(distance_i - distance_j, temperatures[i + 1], sa.constant_k)
+                swap_attempts[i] += 1
+                if rng.random() < exp(min(0, exponent)):
+                    ladder[i], ladder[i + 1] = ladder[i + 1], ladder[i]
+                    swap_accepts[i] += 1
+            logger.debug("Round %s: best distance %s", round_index, best_distance)
+
+            if target_distance is not None and best_distance <= target_distance:
+                break
+        for connection in connections:
+            connection.send(None)
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # Remove the rounding error accumulated by the incremental updates
+    best_distance = calculate_total_distance(best_routes, distance_matrix)
+    swap_acceptance_rates = [accepts / attempts if attempts else 0.0
+                             for accepts, attempts in zip(swap_accepts, swap_attempts)]
+
+    endSearchClock = datetime.now().timestamp()
+    runtime = endSearchClock - startSearchClock
+    print("Initial distance:", initial_distance)
+    print("Best distance:", best_distance)
+    print("Best routes:", best_routes)
+    print("Swap acceptance rates:", swap_acceptance_rates)
+    print(f"Runtime: {runtime}")
+
+    run_stats = asdict(stats)
+    run_stats["swap_acceptance_rates"] = swap_acceptance_rates
+    run_stats["rounds"] = completed_rounds
+    solution = createSolution(dataset, "Parallel Tempering", sa.neighborhood_selection, initial_routes,
+                              initial_distance, best_distance, best_routes, runtime, temperatures, solutions, [], [],
+                              run_stats)
+    save_sa_data_and_solution(dataset, sa, solution)
+
+    return solution
+
+
+if __name__ == "__main__":
+    sa = getSimulatedAnneling()
+    parallelTempering(20, sa)
@@ -1,17 +1,28 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
+import random
+
 import numpy as np
 
-from src.simulatedAnnealing.coolingSchedules import reduce_temperature
+from src.simulatedAnnealing.batchedMoves import BatchedNeighborhood
+from src.simulatedAnnealing.coolingSchedules import CoolingSchedule, calibrate_temperatures, exhausted_budget
 from src.simulatedAnnealing.n_opt import two_opt_operator, one_opt_operator
 from src.utils.plots import visualize_routes, visualize_routes_sa
-from src.utils.save import save_sa_data_and_solution
+from src.utils.profiling import PhaseProfiler, SCHEDULE_CHECKS
+from src.utils.save import save_sa_data_and_solution, load_routes, load_latest_routes, get_sa_checkpoint_file, \
+    save_checkpoint, load_checkpoint, get_sa_traces_file, get_profile_file
 from src.utils.solution import createSolution
+from src.utils.traces import Trace, trace_summaries
 from src.simulatedAnnealing.calculations import create_feasible_initial_solution, calculate_total_distance, \
-    calculate_distance_matrix
+    get_distance_matrix, acceptance_exponent, get_neighbor_lists
 from src.instance.instance import get_instance
 from src.simulatedAnnealing.unrolling import relocation, find_and_swap_nodes
+from src.VRPTW.solomonInsertion import create_solomon_initial_solution
+from src.VRPTW.VRPTW import create_savings_initial_solution, merge_to_fleet
+from src.utils.events import logger, start_run, resume_run
+from src.utils.feasibilityCheck import RouteSchedules
 
 path_to_repo = Path(__file__).parent.parent.parent.resolve()  # This is the path to the repository
 
@@ -26,13 +37,60 @@ class SimulatedAnnealing:
     constant_k: float
     neighborhood_size: int
     neighborhood_selection: str
+    seed: int = 0
+    # Candidate moves scored together per step with NumPy, 0 for the sequential operators. A step costs a few
+    # sequential neighbours, so batches of dozens of moves are needed to be faster
+    batch_size: int = 0
+    batch_selection: str = "best"
+    # Number of nearest neighbours for granular moves, 0 for uniformly random moves
+    granular_neighbors: int = 0
+    # Results JSON to start from with the "file" starting method, by default the latest run with these parameters in
+    # the results store
+    starting_file: Optional[str] = None
+    # Parameters of the geometricMomentum and adaptive cooling schedules, see CoolingSchedule
+    momentum: float = 0.5
+    target_acceptance: float = 0.5
+    reheat_patience: int = 20
+    max_reheats: int = 3
+    # Derive the initial and final temperature from calibration_samples moves of the initial solution instead,
+    # so that the mean uphill move is accepted with initial_acceptance and the smallest with final_acceptance
+    calibrate: bool = False
+    initial_acceptance: float = 0.8
+    final_acceptance: float = 0.001
+    calibration_samples: int = 300
+    # Budgets that stop the search before the final temperature, None for no limit: wall-clock seconds of the
+    # whole run (as in Solution.runtime), evaluated moves and evaluated moves without a new best solution
+    time_limit: Optional[float] = None
+    max_evaluations: Optional[int] = None
+    patience: Optional[int] = None
+    # Save the search state every checkpoint_interval seconds, by default to get_sa_checkpoint_file, so that an
+    # interrupted run can be continued with resume_simulatedAnnealing
+    checkpoint_interval: Optional[float] = None
+    checkpoint_file: Optional[str] = None
+    # Convergence traces keep at most trace_capacity values each, thinned out evenly ("decimate") or the most
+    # recent ones ("ring"), see src.utils.traces.Trace
+    trace_capacity: int = 10000
+    trace_retention: str = "decimate"
+    # Save plots of the initial and best routes, rendered in the background
+    plot: bool = True
+    # Time the phases of the search and count the outcomes of the moves ("phases"), also capturing the search with
+    # cProfile ("cprofile"), see src.utils.profiling.PhaseProfiler. None to profile nothing
+    profile: Optional[str] = None
 
     def __post_init__(self):
+        if self.starting_method not in ["feasible", "solomon", "savings", "file"]:
+            raise ValueError("Starting method must be either 'feasible', 'solomon', 'savings' or 'file'")
         if self.neighborhood_selection not in ["unroll", "1_opt", "2_opt"]:
             raise ValueError("Neighborhood selection must be either 'unrolling' or 'swapping'")
-        if self.cooling_schedule not in ["geometric", "cauchy", "logarithmic", "geometricMomentum"]:
-            raise ValueError(
-                "Cooling schedule must be either 'geometric', 'cauchy', 'logarithmic' or 'geometricMomentum'")
+        if self.cooling_schedule not in ["geometric", "cauchy", "logarithmic", "geometricMomentum", "adaptive"]:
+            raise ValueError("Cooling schedule must be either 'geometric', 'cauchy', 'logarithmic', "
+                             "'geometricMomentum' or 'adaptive'")
+        if self.batch_selection not in ["best", "boltzmann"]:
+            raise ValueError("Batch selection must be either 'best' or 'boltzmann'")
+        if self.trace_retention not in ["decimate", "ring"]:
+            raise ValueError("Trace retention must be either 'decimate' or 'ring'")
+        if self.profile not in [None, "phases", "cprofile"]:
+            raise ValueError("Profile must be either None, 'phases' or 'cprofile'")
 
 
 def getSimulatedAnneling():
@@ -50,13 +108,101 @@ def getSimulatedAnneling():
     return sa
 
 
-def simulatedAnnealing(dataset: int, sa: SimulatedAnnealing):
+def create_initial_routes(dataset, sa: SimulatedAnnealing, num_routes):
+    """
+    Starting solution of the search: random feasible routes ("feasible"), Solomon's I1 insertion ("solomon"),
+    the Clarke-Wright savings routes ("savings") or the best routes of a saved solution ("file"). Empty routes are
+    left out, as no operator moves a customer onto them.
+    """
+    if sa.starting_method == "solomon":
+        return create_solomon_initial_solution(dataset, num_routes)
+    if sa.starting_method == "savings":
+        return create_savings_initial_solution(dataset, num_routes)
+    if sa.starting_method == "file":
+        if sa.starting_file is not None:
+            routes, source = load_routes(sa.starting_file), sa.starting_file
+        else:
+            latest = load_latest_routes(dataset, sa, "Simulated Annealing")
+            if latest is None:
+                raise ValueError("No stored Simulated Annealing run with these parameters to start from")
+            routes, source = latest[0], f"run {latest[1]} of the results store"
+        customers = sorted(customer for route in routes for customer in route[1:-1])
+        if customers != list(range(1, len(get_instance(dataset).id))):
+            raise ValueError(f"Routes in {source} do not visit every customer of the instance once")
+        routes = merge_to_fleet([route for route in routes if len(route) > 2], get_instance(dataset),
+                                get_distance_matrix(dataset), num_routes)
+        print(f"Initial solution loaded from {source}: {routes}")
+        return routes
+    return create_feasible_initial_solution(dataset, num_routes, sa.seed)
+
+
+def propose_move(routes, data, distance_matrix, schedules, neighborhood_selection, neighbors=None):
+    """
+    Apply the neighborhood operator to a copy of the routes, as a granular move when nearest neighbour lists
+    are given. Returns the new routes and the change in total distance.
+    """
+    new_routes = routes.copy()
+
+    # Each operator returns the change in total distance, so only the edges it touched are evaluated
+    if neighborhood_selection == "unroll":
+        new_routes, relocation_delta = relocation(new_routes, data.demand, data.capacity, data.ready_time,
+                                                  data.due_time, data.service_time, distance_matrix, schedules,
+                                                  neighbors)
+        new_routes, swap_delta = find_and_swap_nodes(new_routes, data.locations, data.demand, data.capacity,
+                                                     data.ready_time, data.due_time, data.service_time,
+                                                     distance_matrix, schedules)
+        return new_routes, relocation_delta + swap_delta
+
+    if neighborhood_selection == "1_opt":
+        return one_opt_operator(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                data.service_time, distance_matrix, schedules, neighbors)
+
+    if neighborhood_selection == "2_opt":
+        return two_opt_operator(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                data.service_time, distance_matrix, schedules, neighbors)
+
+
+def calibrate_sa_temperatures(routes, data, distance_matrix, schedules, sa, neighbors=None):
+    """
+    Initial and final temperature from the deltas of sa.calibration_samples moves of the configured operator on the
+    routes, see calibrate_temperatures. Returns None when no uphill move was sampled.
+    """
+    deltas = [propose_move(routes, data, distance_matrix, schedules, sa.neighborhood_selection, neighbors)[1]
+              for _ in range(sa.calibration_samples)]
+    temperatures = calibrate_temperatures(deltas, sa.constant_k, sa.initial_acceptance, sa.final_acceptance)
+    if temperatures is None:
+        print("No uphill move sampled, the configured temperatures are used.")
+    return temperatures
+
+
+def resume_simulatedAnnealing(checkpoint_file_path):
+    """
+    Continue the SA run saved in the checkpoint. The search goes on exactly as it would have without interruption.
+    """
+    checkpoint = load_checkpoint(checkpoint_file_path)
+    print(f"Resuming from {checkpoint_file_path} after {checkpoint['stats'].proposals} proposals.")
+    return simulatedAnnealing(checkpoint["dataset"], checkpoint["sa"], checkpoint)
+
+
+def simulatedAnnealing(dataset: int, sa: SimulatedAnnealing, checkpoint: Optional[dict] = None):
     startSearchClock = datetime.now().timestamp()
+    stats = start_run()
+    profiler = PhaseProfiler(sa.profile) if checkpoint is None else checkpoint["profiler"]
+    # Seed both generators whatever the starting method: the operators and the calibration draw from random,
+    # the acceptance test and the batched moves from np.random
+    random.seed(sa.seed)
+    np.random.seed(sa.seed)
     data = get_instance(dataset)
     num_routes = data.num_vehicles
-    distance_matrix = calculate_distance_matrix(data.locations)
-    initial_routes = create_feasible_initial_solution(dataset, num_routes)
-    visualize_routes(dataset, initial_routes, "initial_solution_for_sa", show=False, save=True)
+    distance_matrix = get_distance_matrix(dataset)
+    if checkpoint is None:
+        initial_routes = create_initial_routes(dataset, sa, num_routes)
+        if sa.plot:
+            profiler.lap("setup")
+            visualize_routes(dataset, initial_routes, "initial_solution_for_sa", show=False, save=True)
+            profiler.lap("io")
+    else:
+        initial_routes = checkpoint["initial_routes"]
 
     current_routes = initial_routes.copy()
     best_routes = initial_routes.copy()
@@ -64,73 +210,184 @@ def simulatedAnnealing(dataset: int, sa: SimulatedAnnealing):
     print(f"Initial distance: {round(initial_distance)}")
     current_distance = initial_distance
     best_distance = current_distance
+    if checkpoint is not None:
+        current_routes, current_distance = checkpoint["current_routes"], checkpoint["current_distance"]
+        best_routes, best_distance = checkpoint["best_routes"], checkpoint["best_distance"]
+    # Cached route schedules check moves in constant time and are only rebuilt for accepted moves
+    schedules = RouteSchedules(current_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                               data.service_time, distance_matrix)
+    # Nearest neighbour lists restrict the operators to moves between nearby customers on large instances
+    neighbors = get_neighbor_lists(dataset, sa.granular_neighbors) if sa.granular_neighbors else None
+    batch = None
+    if sa.batch_size:
+        # Customer exchanges for 2-opt, relocations for the other neighborhoods
+        batch = BatchedNeighborhood(current_routes, schedules, data, distance_matrix, sa.batch_size,
+                                    "swap" if sa.neighborhood_selection == "2_opt" else "relocate",
+                                    sa.batch_selection)
 
     # Simulated Annealing parameters
     initial_temperature = initial_distance * sa.initial_temperature
-    current_temperature = initial_temperature
     k = sa.constant_k
     final_temperature = sa.final_temperature
+    calibration = calibrate_sa_temperatures(current_routes, data, distance_matrix, schedules, sa, neighbors) \
+        if sa.calibrate and checkpoint is None else None
+    if calibration is not None:
+        initial_temperature, final_temperature = calibration
+        # The calibration moves are not part of the search
+        stats = start_run()
+    current_temperature = initial_temperature
+    cooling = CoolingSchedule(sa, initial_temperature, final_temperature)
     iterations = sa.neighborhood_size
-    temperatures = []
-    solutions = []
-    accepted_solutions = []
-    acceptance_probabilities = []
+    temperatures = Trace(sa.trace_capacity, sa.trace_retention)
+    solutions = Trace(sa.trace_capacity, sa.trace_retention)
+    accepted_solutions = Trace(sa.trace_capacity, sa.trace_retention)
+    acceptance_probabilities = Trace(sa.trace_capacity, sa.trace_retention)
 
-    np.random.seed(0)
     counter = 0
+    termination = "final_temperature"
+    # A batched step evaluates batch_size moves
+    evaluations_per_step = sa.batch_size or 1
+    last_improvement = 0
+
+    checkpoint_file_path = sa.checkpoint_file or get_sa_checkpoint_file(dataset, sa)
+    if checkpoint is not None:
+        calibration = checkpoint["calibration"]
+        final_temperature = checkpoint["final_temperature"]
+        current_temperature = checkpoint["current_temperature"]
+        cooling = checkpoint["cooling"]
+        temperatures, solutions = checkpoint["temperatures"], checkpoint["solutions"]
+        accepted_solutions = checkpoint["accepted_solutions"]
+        acceptance_probabilities = checkpoint["acceptance_probabilities"]
+        counter, last_improvement = checkpoint["counter"], checkpoint["last_improvement"]
+        stats = resume_run(checkpoint["stats"])
+        random.setstate(checkpoint["random_state"])
+        np.random.set_state(checkpoint["numpy_random_state"])
+        # The time spent before the interruption counts towards the runtime and the time limit
+        startSearchClock -= checkpoint["elapsed"]
+    last_checkpoint = datetime.now().timestamp()
     print(
         f"Solution entered Simulated Annealing with {round(current_distance)} as initial solution and {round(current_temperature)} as initial temperature.")
+    operator = sa.neighborhood_selection if batch is None else f"batch_{batch.move}"
+    profiler.instrument_methods(schedules, SCHEDULE_CHECKS, "feasibility")
+    profiler.lap("setup")
+    profiler.start_capture()
     while current_temperature > final_temperature:
-        print(f"Current temperature: {current_temperature}")
-        new_routes = current_routes.copy()
-
-        if sa.neighborhood_selection == "unroll":
-            new_routes = relocation(new_routes, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time, distance_matrix)
-            new_routes = find_and_swap_nodes(new_routes, data.locations, data.demand, data.capacity, data.ready_time,
-                                             data.due_time, data.service_time, distance_matrix)
-
-        if sa.neighborhood_selection == "1_opt":
-            new_routes = one_opt_operator(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
-                                          data.service_time, distance_matrix)
-
-        if sa.neighborhood_selection == "2_opt":
-            new_routes = two_opt_operator(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
-                                          data.service_time, distance_matrix)
-        print(f"New routes: {new_routes}")
-        new_distance = calculate_total_distance(new_routes, distance_matrix)
+        if sa.checkpoint_interval is not None and \
+                datetime.now().timestamp() - last_checkpoint >= sa.checkpoint_interval:
+            save_checkpoint(checkpoint_file_path, {
+                "dataset": dataset,
+                "sa": sa,
+                "initial_routes": initial_routes,
+                "current_routes": current_routes if batch is None else batch.tour.to_routes(),
+                "current_distance": current_distance,
+                "best_routes": best_routes,
+                "best_distance": best_distance,
+                "calibration": calibration,
+                "final_temperature": final_temperature,
+                "current_temperature": current_temperature,
+                "cooling": cooling,
+                "temperatures": temperatures,
+                "solutions": solutions,
+                "accepted_solutions": accepted_solutions,
+                "acceptance_probabilities": acceptance_probabilities,
+                "counter": counter,
+                "last_improvement": last_improvement,
+                "stats": stats,
+                "profiler": profiler,
+                "random_state": random.getstate(),
+                "numpy_random_state": np.random.get_state(),
+                "elapsed": datetime.now().timestamp() - startSearchClock
+            })
+            last_checkpoint = datetime.now().timestamp()
+            logger.debug("Checkpoint saved to %s", checkpoint_file_path)
+            profiler.lap("io")
+        budget = exhausted_budget(sa, startSearchClock, stats.proposals * evaluations_per_step,
+                                  (stats.proposals - last_improvement) * evaluations_per_step)
+        if budget is not None:
+            termination = budget
+            break
+        profiler.lap("schedule")
+        logger.debug("Current temperature: %s", current_temperature)
+        stats.proposals += 1
+        if batch is not None:
+            # The move is applied to batch.tour in place until it is accepted or rejected
+            new_routes = None
+            delta_distance = batch.propose(current_temperature, k)
+        else:
+            new_routes, delta_distance = propose_move(current_routes, data, distance_matrix, schedules,
+                                                      sa.neighborhood_selection, neighbors)
+        profiler.lap("propose")
+        logger.debug("New routes: %s", new_routes)
+        new_distance = current_distance + delta_distance
         solutions.append(new_distance)
-        print(f"New distance: {round(new_distance)}")
-        delta_distance = new_distance - current_distance
+        logger.debug("New distance: %s", round(new_distance))
+        profiler.lap("evaluation")
         if delta_distance < 0:
-            print(f"Delta distance: {delta_distance}")
-            current_routes = new_routes
+            logger.debug("Delta distance: %s", delta_distance)
+            stats.improving_accepts += 1
+            profiler.count(operator, "improving")
+            if batch is not None:
+                batch.accept()
+            else:
+                current_routes = new_routes
+                schedules.update(current_routes)
             current_distance = new_distance
-            solutions.append(current_distance)
             if new_distance < best_distance:
-                best_routes = new_routes
+                best_routes = current_routes if batch is None else batch.tour.to_routes()
                 best_distance = new_distance
-                print(f"New best distance: {round(best_distance)}")
-        elif np.random.rand() < np.exp(-delta_distance / k * current_temperature):
-            print(f"Delta distance: {delta_distance}")
-            print(f"Exponent: {-delta_distance / k * current_temperature}")
-            acceptance_probabilities.append(np.exp(-delta_distance / k * current_temperature))
-            current_routes = new_routes
+                last_improvement = stats.proposals
+                cooling.record_improvement(current_temperature)
+                logger.debug("New best distance: %s", round(best_distance))
+        elif np.random.rand() < np.exp(acceptance_exponent(delta_distance, current_temperature, k)):
+            logger.debug("Delta distance: %s", delta_distance)
+            logger.debug("Exponent: %s", acceptance_exponent(delta_distance, current_temperature, k))
+            if delta_distance > 0:
+                stats.uphill_accepts += 1
+                profiler.count(operator, "accepted")
+            else:
+                stats.neutral_moves += 1
+                profiler.count(operator, "neutral")
+            cooling.record(delta_distance, True)
+            acceptance_probability = np.exp(acceptance_exponent(delta_distance, current_temperature, k))
+            acceptance_probabilities.append(acceptance_probability)
+            if batch is not None:
+                batch.accept()
+            else:
+                current_routes = new_routes
+                schedules.update(current_routes)
             current_distance = new_distance
             accepted_solutions.append(current_distance)
-            print(
-                f"Solution {round(current_distance)} accepted with probability {np.exp(-delta_distance / k * current_temperature)}")
-            print(f"New best distance: {round(current_distance)}")
+            logger.debug("Solution %s accepted with probability %s", round(current_distance),
+                         acceptance_probability)
+            logger.debug("New best distance: %s", round(current_distance))
+        else:
+            stats.uphill_rejects += 1
+            profiler.count(operator, "rejected")
+            cooling.record(delta_distance, False)
+            if batch is not None:
+                batch.reject()
         if current_distance < best_distance:
-            best_routes = current_routes
+            best_routes = current_routes if batch is None else batch.tour.to_routes()
             best_distance = current_distance
-            print(f"New best distance: {round(best_distance)}")
+            last_improvement = stats.proposals
+            cooling.record_improvement(current_temperature)
+            logger.debug("New best distance: %s", round(best_distance))
+        profiler.lap("acceptance")
         counter += 1
         if counter % iterations == 0:
-            current_temperature = reduce_temperature(current_temperature, sa)  ## review this
+            current_temperature = cooling.reduce_temperature(current_temperature)
             temperatures.append(current_temperature)
-            print(f"New Temperature: {current_temperature}")
+            logger.debug("New Temperature: %s", current_temperature)
+        profiler.lap("schedule")
+
+    profiler.stop_capture()
+    profiler.lap("schedule")
+    # Remove the rounding error accumulated by the incremental updates
+    best_distance = calculate_total_distance(best_routes, distance_matrix)
+    profiler.lap("evaluation")
 
     print(f"Temperature: {current_temperature}")
+    print(f"Stopped by: {termination}")
     print("Initial distance:", initial_distance)
     print("Best distance:", best_distance)
     print("Best routes:", best_routes)
@@ -139,9 +396,20 @@ def simulatedAnnealing(dataset: int, sa: SimulatedAnnealing):
     runtime = endSearchClock - startSearchClock
     print(f"Runtime: {runtime}")
     solution = createSolution(dataset, "Simulated Annealing", sa.neighborhood_selection, initial_routes, initial_distance,
-                              best_distance, best_routes, runtime, temperatures, solutions, accepted_solutions,
-                              acceptance_probabilities)
-    visualize_routes_sa(dataset, solution.best_routes, sa, show=False, save=True)
+                              best_distance, best_routes, runtime, temperatures.values(), solutions.values(),
+                              accepted_solutions.values(), acceptance_probabilities.values(),
+                              {**asdict(stats), "reheats": cooling.reheats, "calibrated_temperatures": calibration,
+                               "traces": trace_summaries(temperatures=temperatures, solutions=solutions,
+                                                         accepted_solutions=accepted_solutions,
+                                                         acceptance_probabilities=acceptance_probabilities)},
+                              termination)
+    if sa.plot:
+        visualize_routes_sa(dataset, solution.best_routes, sa, show=False, save=True)
+    profiler.lap("io")
+    if profiler.enabled:
+        # Saving the results is the only part of the run left out
+        solution.stats["profile"] = profiler.summary(
+            get_profile_file(get_sa_traces_file(dataset, sa, solution.algorithm)))
     save_sa_data_and_solution(dataset, sa, solution)
 
     return solution
@@ -1,19 +1,25 @@
+import logging
 import random
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from datetime import datetime
 from math import ceil
+from typing import Optional
 
 import numpy as np
 
 from src.instance.instance import get_instance
-from src.simulatedAnnealing.calculations import calculate_distance_matrix, \
-    calculate_total_distance, create_feasible_initial_solution
-from src.simulatedAnnealing.coolingSchedules import reduce_temperature
+from src.simulatedAnnealing.calculations import get_distance_matrix, \
+    calculate_total_distance, create_feasible_initial_solution, acceptance_exponent, removal_delta, insertion_delta, replacement_delta, \
+    adjacent_swap_delta
+from src.simulatedAnnealing.coolingSchedules import CoolingSchedule, calibrate_temperatures, exhausted_budget
 from src.simulatedAnnealing.unrolling import calculate_distance
 
 from src.utils.plots import visualize_routes, visualize_routes_sa_soft
-from src.utils.save import save_sa_data_and_solution_soft
+from src.utils.profiling import PhaseProfiler
+from src.utils.save import save_sa_data_and_solution_soft, get_sa_soft_traces_file, get_profile_file
 from src.utils.solution import createSolution
+from src.utils.traces import Trace, trace_summaries
+from src.utils.events import logger, count_infeasible, start_run
 from src.utils.feasibilityCheck import is_feasible
 
 
@@ -30,10 +36,43 @@ class SimulatedAnnealingSoft:
     penalty_too_early: float
     penalty_too_late: float
     total_penalty: float
+    seed: int = 0
+    # Parameters of the geometricMomentum and adaptive cooling schedules, see CoolingSchedule
+    momentum: float = 0.5
+    target_acceptance: float = 0.5
+    reheat_patience: int = 20
+    max_reheats: int = 3
+    # Derive the initial and final temperature from calibration_samples moves of the initial solution instead,
+    # so that the mean uphill move is accepted with initial_acceptance and the smallest with final_acceptance
+    calibrate: bool = False
+    initial_acceptance: float = 0.8
+    final_acceptance: float = 0.001
+    calibration_samples: int = 300
+    # Budgets that stop the search before the final temperature, None for no limit: wall-clock seconds of the
+    # whole run (as in Solution.runtime), evaluated moves and evaluated moves without a new best solution
+    time_limit: Optional[float] = None
+    max_evaluations: Optional[int] = None
+    patience: Optional[int] = None
+    # Convergence traces keep at most trace_capacity values each, thinned out evenly ("decimate") or the most
+    # recent ones ("ring"), see src.utils.traces.Trace
+    trace_capacity: int = 10000
+    trace_retention: str = "decimate"
+    # Save plots of the initial and best routes, rendered in the background
+    plot: bool = True
+    # Time the phases of the search and count the outcomes of the moves ("phases"), also capturing the search with
+    # cProfile ("cprofile"), see src.utils.profiling.PhaseProfiler. None to profile nothing
+    profile: Optional[str] = None
 
     def __post_init__(self):
         if self.neighborhood_selection not in ["unroll", "1_opt", "2_opt"]:
             raise ValueError("Neighborhood selection must be either 'unrolling' or 'swapping'")
+        if self.cooling_schedule not in ["geometric", "cauchy", "logarithmic", "geometricMomentum", "adaptive"]:
+            raise ValueError("Cooling schedule must be either 'geometric', 'cauchy', 'logarithmic', "
+                             "'geometricMomentum' or 'adaptive'")
+        if self.trace_retention not in ["decimate", "ring"]:
+            raise ValueError("Trace retention must be either 'decimate' or 'ring'")
+        if self.profile not in [None, "phases", "cprofile"]:
+            raise ValueError("Profile must be either None, 'phases' or 'cprofile'")
 
 
 def getSimulatedAnnelingSoft():
@@ -54,20 +93,59 @@ def getSimulatedAnnelingSoft():
     return sa
 
 
+def propose_move_soft(routes, data, distance_matrix, neighborhood_selection, feasibility_check=None):
+    """
+    Apply the soft neighborhood operator to a copy of the routes, checking the changed routes with
+    feasibility_check, is_feasible_soft by default. Returns the new routes and the change in total distance.
+    """
+    new_routes = routes.copy()
+    feasibility_check = feasibility_check or is_feasible_soft
+
+    if neighborhood_selection == "unroll":
+        new_routes, swap_delta = find_and_swap_nodes_soft(new_routes, data.locations, data.demand, data.capacity,
+                                                          data.ready_time, data.due_time, data.service_time,
+                                                          distance_matrix, feasibility_check)
+
+        new_routes, relocation_delta = relocation_soft(new_routes, data.demand, data.capacity, data.ready_time,
+                                                       data.due_time, data.service_time, distance_matrix,
+                                                       feasibility_check)
+        return new_routes, swap_delta + relocation_delta
+
+    if neighborhood_selection == "1_opt":
+        return one_opt_operator_soft(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                     data.service_time, distance_matrix, feasibility_check)
+
+    if neighborhood_selection == "2_opt":
+        return two_opt_operator_soft(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                                     data.service_time, distance_matrix, feasibility_check)
+
+
 def simulatedAnnealing_soft(dataset: int, sa: SimulatedAnnealingSoft):
     startSearchClock = datetime.now().timestamp()
+    stats = start_run()
+    profiler = PhaseProfiler(sa.profile)
+    # Seed both generators whatever the starting method: the operators and the calibration draw from random,
+    # the acceptance test and the batched moves from np.random
+    random.seed(sa.seed)
+    np.random.seed(sa.seed)
     data = get_instance(dataset)
     num_routes = data.num_vehicles
-    distance_matrix = calculate_distance_matrix(data.locations)
-    initial_routes = create_feasible_initial_solution(dataset, num_routes)
-    visualize_routes(dataset, initial_routes, "initial_solution_soft_for_sa", show=False, save=True)
+    distance_matrix = get_distance_matrix(dataset)
+    initial_routes = create_feasible_initial_solution(dataset, num_routes, sa.seed)
+    if sa.plot:
+        profiler.lap("setup")
+        visualize_routes(dataset, initial_routes, "initial_solution_soft_for_sa", show=False, save=True)
+        profiler.lap("io")
 
     initial_distance = calculate_total_distance(initial_routes, distance_matrix)
     print(f"Initial distance: {round(initial_distance)}")
     current_routes = initial_routes.copy()
     best_routes = initial_routes.copy()
 
-    current_penalty = sum_penalty(sa, current_routes, data.ready_time, data.due_time, data.service_time, distance_matrix)
+    # Penalty of every route, so a move only re-evaluates the routes it replaced
+    current_route_penalties = [route_penalty(sa, route, data.ready_time, data.due_time, data.service_time,
+                                             distance_matrix) for route in current_routes]
+    current_penalty = sum(current_route_penalties)
     best_penalty = current_penalty
 
     ## distance
@@ -76,82 +154,115 @@ def simulatedAnnealing_soft(dataset: int, sa: SimulatedAnnealingSoft):
 
     # Simulated Annealing parameters
     initial_temperature = sa.initial_temperature
-    current_temperature = initial_temperature
     k = sa.constant_k
     final_temperature = sa.final_temperature
+    calibration = None
+    if sa.calibrate:
+        deltas = [propose_move_soft(current_routes, data, distance_matrix, sa.neighborhood_selection)[1]
+                  for _ in range(sa.calibration_samples)]
+        calibration = calibrate_temperatures(deltas, k, sa.initial_acceptance, sa.final_acceptance)
+        if calibration is None:
+            print("No uphill move sampled, the configured temperatures are used.")
+        else:
+            initial_temperature, final_temperature = calibration
+            # The calibration moves are not part of the search
+            stats = start_run()
+    current_temperature = initial_temperature
+    cooling = CoolingSchedule(sa, initial_temperature, final_temperature)
     iterations = sa.neighborhood_size
-    temperatures = []
-    solutions = []
-    accepted_solutions = []
-    acceptance_probabilities = []
+    temperatures = Trace(sa.trace_capacity, sa.trace_retention)
+    solutions = Trace(sa.trace_capacity, sa.trace_retention)
+    accepted_solutions = Trace(sa.trace_capacity, sa.trace_retention)
+    acceptance_probabilities = Trace(sa.trace_capacity, sa.trace_retention)
 
-    np.random.seed(0)
     counter = 0
+    termination = "final_temperature"
+    last_improvement = 0
     print(
         f"Solution entered Simulated Annealing with {round(current_distance)} as initial solution and {round(current_temperature)} as initial temperature.")
+    operator = sa.neighborhood_selection
+    feasibility_check = profiler.instrument(is_feasible_soft, "feasibility")
+    profiler.lap("setup")
+    profiler.start_capture()
     while current_temperature > final_temperature:
-
-        new_routes = current_routes.copy()
-
-        if sa.neighborhood_selection == "unroll":
-            new_routes = find_and_swap_nodes_soft(new_routes, data.locations, data.demand, data.capacity,
-                                                  data.ready_time, data.due_time, data.service_time, distance_matrix)
-
-            new_routes = relocation_soft(new_routes, data.demand, data.capacity, data.ready_time, data.due_time,
-                                         data.service_time,
-                                         distance_matrix)
-        if sa.neighborhood_selection == "1_opt":
-            new_routes = one_opt_operator_soft(new_routes, data.demand, data.capacity, data.ready_time,
-                                               data.due_time,
-                                               data.service_time, distance_matrix)
-
-        if sa.neighborhood_selection == "2_opt":
-            new_routes = two_opt_operator_soft(new_routes, data.demand, data.capacity, data.ready_time,
-                                               data.due_time,
-                                               data.service_time, distance_matrix)
-
-        # Evaluate the new solution with penalties for soft time window violations
-        new_penalty = sum_penalty(sa, new_routes, data.ready_time, data.due_time, data.service_time,
-                                  distance_matrix)
-        new_distance = calculate_total_distance(new_routes, distance_matrix)
+        budget = exhausted_budget(sa, startSearchClock, stats.proposals, stats.proposals - last_improvement)
+        if budget is not None:
+            termination = budget
+            break
+        profiler.lap("schedule")
+        stats.proposals += 1
+        new_routes, delta = propose_move_soft(current_routes, data, distance_matrix, sa.neighborhood_selection,
+                                              feasibility_check)
+        profiler.lap("propose")
+
+        # Evaluate the new solution with penalties for soft time window violations; operators replace the routes
+        # they change with new lists, so the other routes keep their cached penalty
+        new_route_penalties = [
+            penalty if new_route is current_route else
+            route_penalty(sa, new_route, data.ready_time, data.due_time, data.service_time, distance_matrix)
+            for new_route, current_route, penalty in zip(new_routes, current_routes, current_route_penalties)]
+        new_penalty = sum(new_route_penalties)
+        new_distance = current_distance + delta
 
         solutions.append(new_distance)
-        print(f"New distance: {round(new_distance)}")
-        delta = new_distance - current_distance
+        logger.debug("New distance: %s", round(new_distance))
+        profiler.lap("evaluation")
 
         if delta < 0 and new_penalty < sa.total_penalty:
-            print(f"Delta distance: {delta}")
+            logger.debug("Delta distance: %s", delta)
+            stats.improving_accepts += 1
+            profiler.count(operator, "improving")
             current_routes = new_routes
             current_distance = new_distance
             current_penalty = new_penalty
-            solutions.append(current_distance)
+            current_route_penalties = new_route_penalties
             if new_distance < best_distance and new_penalty < sa.total_penalty:
                 best_routes = new_routes
                 best_distance = new_distance
                 best_penalty = new_penalty
-                print(f"New best distance: {round(best_distance)}")
-            elif np.random.rand() < np.exp(-delta / k * current_temperature):
-                acceptance_probabilities.append(np.exp(-delta / k * current_temperature))
+                last_improvement = stats.proposals
+                cooling.record_improvement(current_temperature)
+                logger.debug("New best distance: %s", round(best_distance))
+            elif np.random.rand() < np.exp(acceptance_exponent(delta, current_temperature, k)):
+                acceptance_probability = np.exp(acceptance_exponent(delta, current_temperature, k))
+                acceptance_probabilities.append(acceptance_probability)
                 current_routes = new_routes
                 current_distance = new_distance
                 current_penalty = new_penalty
+                current_route_penalties = new_route_penalties
                 accepted_solutions.append(current_distance)
-                print(
-                    f"Solution {round(current_distance)} accepted with probability {np.exp(-delta / k * current_temperature)}")
-                print(f"New best distance: {round(current_distance)}")
+                logger.debug("Solution %s accepted with probability %s", round(current_distance),
+                             acceptance_probability)
+                logger.debug("New best distance: %s", round(current_distance))
+        else:
+            # Moves that do not shorten the routes within the penalty budget are never accepted
+            stats.uphill_rejects += 1
+            profiler.count(operator, "rejected")
+            cooling.record(delta, False)
         if current_distance < best_distance and current_penalty < sa.total_penalty:
             best_routes = current_routes
             best_distance = current_distance
             best_penalty = current_penalty
-            print(f"New best distance: {round(best_distance)}")
+            last_improvement = stats.proposals
+            cooling.record_improvement(current_temperature)
+            logger.debug("New best distance: %s", round(best_distance))
+        profiler.lap("acceptance")
 
         counter += 1
         if counter % iterations == 0:
-            current_temperature = reduce_temperature(current_temperature, sa)  ## review this
+            current_temperature = cooling.reduce_temperature(current_temperature)
             temperatures.append(current_temperature)
-            print(f"New Temperature: {current_temperature}")
+            logger.debug("New Temperature: %s", current_temperature)
+        profiler.lap("schedule")
+
+    profiler.stop_capture()
+    profiler.lap("schedule")
+    # Remove the rounding error accumulated by the incremental updates
+    best_distance = calculate_total_distance(best_routes, distance_matrix)
+    profiler.lap("evaluation")
 
     print(f"Temperature: {current_temperature}")
+    print(f"Stopped by: {termination}")
     print("Initial distance:", initial_distance)
     print("Best distance:", best_distance)
     print("Best routes:", best_routes)
@@ -162,10 +273,20 @@ def simulatedAnnealing_soft(dataset: int, sa: SimulatedAnnealingSoft):
     print(f"Runtime: {runtime}")
     solution = createSolution(dataset, "Simulated Annealing Soft", sa.neighborhood_selection, initial_routes,
                               initial_distance,
-                              best_distance, best_routes, runtime, temperatures, solutions, accepted_solutions,
-                              acceptance_probabilities)
+                              best_distance, best_routes, runtime, temperatures.values(), solutions.values(),
+                              accepted_solutions.values(), acceptance_probabilities.values(),
+                              {**asdict(stats), "reheats": cooling.reheats, "calibrated_temperatures": calibration,
+                               "traces": trace_summaries(temperatures=temperatures, solutions=solutions,
+                                                         accepted_solutions=accepted_solutions,
+                                                         acceptance_probabilities=acceptance_probabilities)},
+                              termination)
+    if profiler.enabled:
+        # Saving the results and the plot are left out
+        solution.stats["profile"] = profiler.summary(
+            get_profile_file(get_sa_soft_traces_file(dataset, sa, solution.algorithm)))
     save_sa_data_and_solution_soft(dataset, sa, solution)
-    visualize_routes_sa_soft(dataset, solution.best_routes, sa, show=False, save=True)
+    if sa.plot:
+        visualize_routes_sa_soft(dataset, solution.best_routes, sa, show=False, save=True)
     return solution
 
 
@@ -176,7 +297,7 @@ def create_feasible_soft_initial_solution(instance, num_routes):
 
     # Convert customers data into a list of dictionaries for easier manipulation
     customers_list = [
-        {'id': data.id[i], 'location': data.locations[i], 'demand': data.demand[i],
+        {'id': int(data.id[i]), 'location': data.locations[i], 'demand': data.demand[i],
          'ready_time': data.ready_time[i], 'due_time': data.due_time[i],
          'service_time': data.service_time[i]} for i in range(1, num_customers + 1)
     ]
@@ -187,8 +308,7 @@ def create_feasible_soft_initial_solution(instance, num_routes):
     # Extract sorted IDs for route creation
     sorted_ids = [customer['id'] for customer in sorted_customers_by_ready_time]
 
-    # Distance matrix (assuming it's available)
-    distance_matrix = calculate_distance_matrix(data.locations)
+    distance_matrix = get_distance_matrix(instance)
     n_customers_per_route = ceil(num_customers / num_routes)
 
     while True:
@@ -222,43 +342,42 @@ def create_feasible_soft_initial_solution(instance, num_routes):
 
 def sum_penalty(sa, routes, ready_time, due_time, service_time, distance_matrix):
     total_penalty = 0
-    total_distance = 0
 
     for route in routes:
-        current_time = 0
-        route_distance = 0
+        total_penalty += route_penalty(sa, route, ready_time, due_time, service_time, distance_matrix)
 
-        for i in range(1, len(route)):
-            customer = route[i]
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Total distance: %s", round(calculate_total_distance(routes, distance_matrix)))
+        logger.debug("Total penalty: %s", round(total_penalty))
 
-            # Calculate travel time from previous customer to current customer
-            travel_time = distance_matrix[route[i - 1]][customer]
-            current_time += travel_time
-            route_distance += travel_time
+    return total_penalty
 
-            # Check if current time is within the hard time window [LBi, UBi]
-            if current_time < ready_time[customer]:
-                # Penalty for arriving too early (soft window: [LBi, ai))
-                penalty = (ready_time[customer] - current_time) * sa.penalty_too_early
-                total_penalty += penalty
 
-            if ready_time[customer] <= current_time <= due_time[customer]:
-                penalty = 0
-                total_penalty += penalty
+def route_penalty(sa, route, ready_time, due_time, service_time, distance_matrix):
+    total_penalty = 0
+    current_time = 0
 
-            # Check if current time is within the hard time window [ai, bi]
-            if current_time > due_time[customer]:
-                # Penalty for arriving too late (soft window: (bi, UBi])
-                penalty = (current_time - due_time[customer]) * sa.penalty_too_late
-                total_penalty += penalty
+    for i in range(1, len(route)):
+        customer = route[i]
 
-            # Add service time
-            current_time += service_time[customer]
+        # Calculate travel time from previous customer to current customer
+        travel_time = distance_matrix[route[i - 1]][customer]
+        current_time += travel_time
 
-        total_distance += route_distance
+        # Check if current time is within the hard time window [LBi, UBi]
+        if current_time < ready_time[customer]:
+            # Penalty for arriving too early (soft window: [LBi, ai))
+            penalty = (ready_time[customer] - current_time) * sa.penalty_too_early
+            total_penalty += penalty
 
-    print(f"Total distance: {round(total_distance)}")
-    print(f"Total penalty: {round(total_penalty)}")
+        # Check if current time is within the hard time window [ai, bi]
+        if current_time > due_time[customer]:
+            # Penalty for arriving too late (soft window: (bi, UBi])
+            penalty = (current_time - due_time[customer]) * sa.penalty_too_late
+            total_penalty += penalty
+
+        # Add service time
+        current_time += service_time[customer]
 
     return total_penalty
 
@@ -266,7 +385,7 @@ def sum_penalty(sa, routes, ready_time, due_time, service_time, distance_matrix)
 def is_feasible_soft(route, demand, capacity, ready_time, due_time, service_time, distance_matrix):
     current_time = 0
     total_demand = 0
-    print(f"Checking feasibility of route {route}.")
+    logger.debug("Checking feasibility of route %s.", route)
     for i in range(1, len(route) - 1):
         customer = route[i]
         total_demand += demand[customer]
@@ -283,16 +402,17 @@ def is_feasible_soft(route, demand, capacity, ready_time, due_time, service_time
         current_time += service_time[customer]
     result = total_demand <= capacity
     if result:
-        print(f"Route {route} is feasible.")
+        logger.debug("Route %s is feasible.", route)
     else:
-        print(f"Route {route} is not feasible due to capacity constraints.")
+        logger.debug("Route %s is not feasible due to capacity constraints.", route)
     return result
 
 
 ### Neighborhood operators
 
-def one_opt_operator_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Applying 1-Opt operator.")
+def one_opt_operator_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix,
+                          feasibility_check=is_feasible_soft):
+    logger.debug("Applying 1-Opt operator.")
     num_routes = len(routes)
 
     # Select two different random routes
@@ -302,8 +422,8 @@ def one_opt_operator_soft(routes, demand, capacity, ready_time, due_time, servic
 
     # Randomly select a customer (excluding depot) to move between routes
     if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply 1-Opt.")
-        return routes
+        logger.debug("Routes are too short to apply 1-Opt.")
+        return routes, 0
 
     customer_index = random.randint(1, len(route1) - 2)
     customer = route1[customer_index]
@@ -312,20 +432,25 @@ def one_opt_operator_soft(routes, demand, capacity, ready_time, due_time, servic
     new_route1 = route1[:customer_index] + route1[customer_index + 1:]
     new_route2 = route2[:]
 
-    if is_feasible_soft(new_route2 + [customer], demand, capacity, ready_time, due_time, service_time,
+    if feasibility_check(new_route2 + [customer], demand, capacity, ready_time, due_time, service_time,
                         distance_matrix):
         new_route2.append(customer)
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(f"1-Opt operator applied successfully.")
+        logger.debug("1-Opt operator applied successfully.")
+        # The customer is appended after the last node of route2
+        return routes, removal_delta(route1, customer_index, distance_matrix) + \
+            distance_matrix[route2[-1], customer]
     else:
-        print(f"1-Opt operator resulted in infeasible routes. Reverting.")
+        logger.debug("1-Opt operator resulted in infeasible routes. Reverting.")
+        count_infeasible("1_opt")
 
-    return routes
+    return routes, 0
 
 
-def two_opt_operator_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Applying 2-Opt operator.")
+def two_opt_operator_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix,
+                          feasibility_check=is_feasible_soft):
+    logger.debug("Applying 2-Opt operator.")
     num_routes = len(routes)
 
     # Select two different random routes
@@ -335,11 +460,11 @@ def two_opt_operator_soft(routes, demand, capacity, ready_time, due_time, servic
 
     # Randomly select two different customers (excluding depot) to swap between routes
     if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply 2-Opt.")
-        return routes
+        logger.debug("Routes are too short to apply 2-Opt.")
+        return routes, 0
 
-    customer_indices = random.sample(range(1, len(route1) - 1), 2)
-    customer1_index, customer2_index = customer_indices[0], customer_indices[1]
+    customer1_index = random.randint(1, len(route1) - 2)
+    customer2_index = random.randint(1, len(route2) - 2)
 
     customer1 = route1[customer1_index]
     customer2 = route2[customer2_index]
@@ -349,21 +474,24 @@ def two_opt_operator_soft(routes, demand, capacity, ready_time, due_time, servic
     new_route2 = route2[:customer2_index] + [customer1] + route2[customer2_index + 1:]
 
     # Check feasibility of new routes
-    if is_feasible_soft(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
-            is_feasible_soft(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+    if feasibility_check(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
+            feasibility_check(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(f"2-Opt operator applied successfully.")
+        logger.debug("2-Opt operator applied successfully.")
+        return routes, replacement_delta(route1, customer1_index, customer2, distance_matrix) + \
+            replacement_delta(route2, customer2_index, customer1, distance_matrix)
     else:
-        print(f"2-Opt operator resulted in infeasible routes. Reverting.")
+        logger.debug("2-Opt operator resulted in infeasible routes. Reverting.")
+        count_infeasible("2_opt")
 
-    return routes
+    return routes, 0
 
 
 #### unroll
 
 def find_and_swap_nodes_soft(routes, locations, demand, capacity, ready_time, due_time, service_time,
-                             distance_matrix):
+                             distance_matrix, feasibility_check=is_feasible_soft):
     """
     Find nodes i and i+1 such that distance(i, i+2) < distance(i, i+1), and swap i+1 and i+2.
     Ignore the depot nodes at the beginning and end of the route.
@@ -374,14 +502,13 @@ def find_and_swap_nodes_soft(routes, locations, demand, capacity, ready_time, du
 
     # Select a random route
     route_indices = random.sample(range(num_routes), 1)
-    print(f"route indeces: {route_indices}")
+    logger.debug("route indeces: %s", route_indices)
 
     route_index = route_indices[0]
-    print(f"route index: {route_index}")
+    logger.debug("route index: %s", route_index)
     route = routes[route_index]
-    print(f"Route: {route}")
+    logger.debug("Route: %s", route)
 
-    print(f"Location: {locations}")
     num_nodes = len(route)
     for node_index in range(1, num_nodes - 2):
         # Skip depot nodes
@@ -391,30 +518,33 @@ def find_and_swap_nodes_soft(routes, locations, demand, capacity, ready_time, du
 
         # Calculate distances
         dist_i_i1 = calculate_distance(locations[route[node_index]], locations[node_index + 1])
-        print(f"Distance between {route[node_index]} and {route[node_index + 1]}: {dist_i_i1}")
+        logger.debug("Distance between %s and %s: %s", route[node_index], route[node_index + 1], dist_i_i1)
         dist_i_i2 = calculate_distance(locations[route[node_index]], locations[route[node_index + 2]])
-        print(f"Distance between {route[node_index]} and {route[node_index + 2]}: {dist_i_i2}")
+        logger.debug("Distance between %s and %s: %s", route[node_index], route[node_index + 2], dist_i_i2)
 
         # Check condition for swap
         if dist_i_i2 < dist_i_i1:
             # Swap nodes i+1 and i+2
             new_route = route[:]
             new_route[node_index + 1], new_route[node_index + 2] = new_route[node_index + 2], new_route[node_index + 1]
-            print(f"Swapping nodes {route[node_index + 1]} and {route[node_index + 2]} in route {route_index}.")
+            logger.debug("Swapping nodes %s and %s in route %s.", route[node_index + 1], route[node_index + 2],
+                         route_index)
 
             # Check feasibility of the new route
-            if is_feasible_soft(new_route, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+            if feasibility_check(new_route, demand, capacity, ready_time, due_time, service_time, distance_matrix):
                 new_routes[route_index] = new_route
-                print(f"Feasible route after swap: {new_routes}.")
-                return new_routes
+                logger.debug("Feasible route after swap: %s.", new_routes)
+                return new_routes, adjacent_swap_delta(route, node_index + 1, distance_matrix)
             else:
-                print("Infeasible route after swap. Reverting.")
+                logger.debug("Infeasible route after swap. Reverting.")
+                count_infeasible("swap")
 
-    return routes
+    return routes, 0
 
 
-def relocation_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Relocation process started.")
+def relocation_soft(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix,
+                    feasibility_check=is_feasible_soft):
+    logger.debug("Relocation process started.")
 
     num_routes = len(routes)
 
@@ -425,8 +555,8 @@ def relocation_soft(routes, demand, capacity, ready_time, due_time, service_time
 
     # Ensure both routes have more than two nodes (excluding depots)
     if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply Relocation.")
-        return routes
+        logger.debug("Routes are too short to apply Relocation.")
+        return routes, 0
 
     # Randomly select a customer (excluding depot) to move from route1 to route2
     customer_index = random.randint(1, len(route1) - 2)
@@ -435,19 +565,23 @@ def relocation_soft(routes, demand, capacity, ready_time, due_time, service_time
     # Create new routes for feasibility check
     new_route1 = route1[:customer_index] + route1[customer_index + 1:]
     new_route2 = route2[:]
-    new_route2.insert(random.randint(1, len(new_route2) - 1), customer)
+    insert_index = random.randint(1, len(new_route2) - 1)
+    new_route2.insert(insert_index, customer)
 
     # Check if the new routes are feasible
-    if is_feasible_soft(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
-            is_feasible_soft(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+    if feasibility_check(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
+            feasibility_check(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(
-            f"Relocation applied successfully. Moved customer {customer} from route {route1_index} to route {route2_index}.")
+        logger.debug("Relocation applied successfully. Moved customer %s from route %s to route %s.", customer,
+                     route1_index, route2_index)
+        return routes, removal_delta(route1, customer_index, distance_matrix) + \
+            insertion_delta(route2, insert_index, customer, distance_matrix)
     else:
-        print(f"Relocation resulted in infeasible routes. Reverting.")
+        logger.debug("Relocation resulted in infeasible routes. Reverting.")
+        count_infeasible("relocation")
 
-    return routes
+    return routes, 0
 
 
 if __name__ == '__main__':
@@ -2,6 +2,9 @@ import math
 import random
 
 from src.VRPTW.VRPTW import is_feasible
+from src.utils.events import logger, count_infeasible
+from src.simulatedAnnealing.calculations import removal_delta, insertion_delta, adjacent_swap_delta, \
+    select_granular_relocation
 
 
 def calculate_distance(location1, location2):
@@ -13,25 +16,27 @@ def calculate_distance(location1, location2):
 
 #### Swap vehicles when the route coincides with itself
 
-def find_and_swap_nodes(routes, locations, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+def find_and_swap_nodes(routes, locations, demand, capacity, ready_time, due_time, service_time, distance_matrix,
+                        schedules=None):
     """
     Find nodes i and i+1 such that distance(i, i+2) < distance(i, i+1), and swap i+1 and i+2.
     Ignore the depot nodes at the beginning and end of the route.
     Check feasibility of the new route after the swap.
+    Returns the routes and the change in total distance, which is 0 when no swap is applied.
+    With the RouteSchedules of the routes, feasibility is checked in constant time.
     """
     new_routes = routes.copy()
     num_routes = len(routes)
 
     # Select a random route
     route_indices = random.sample(range(num_routes), 1)
-    print(f"route indeces: {route_indices}")
+    logger.debug("route indeces: %s", route_indices)
 
     route_index = route_indices[0]
-    print(f"route index: {route_index}")
+    logger.debug("route index: %s", route_index)
     route = routes[route_index]
-    print(f"Route: {route}")
+    logger.debug("Route: %s", route)
 
-    print(f"Location: {locations}")
     num_nodes = len(route)
     for node_index in range(1, num_nodes - 2):
         # Skip depot nodes
@@ -41,61 +46,94 @@ def find_and_swap_nodes(routes, locations, demand, capacity, ready_time, due_tim
 
         # Calculate distances
         dist_i_i1 = calculate_distance(locations[route[node_index]], locations[node_index + 1])
-        print(f"Distance between {route[node_index]} and {route[node_index + 1]}: {dist_i_i1}")
+        logger.debug("Distance between %s and %s: %s", route[node_index], route[node_index + 1], dist_i_i1)
         dist_i_i2 = calculate_distance(locations[route[node_index]], locations[route[node_index + 2]])
-        print(f"Distance between {route[node_index]} and {route[node_index + 2]}: {dist_i_i2}")
+        logger.debug("Distance between %s and %s: %s", route[node_index], route[node_index + 2], dist_i_i2)
 
         # Check condition for swap
         if dist_i_i2 < dist_i_i1:
             # Swap nodes i+1 and i+2
             new_route = route[:]
             new_route[node_index + 1], new_route[node_index + 2] = new_route[node_index + 2], new_route[node_index + 1]
-            print(f"Swapping nodes {route[node_index + 1]} and {route[node_index + 2]} in route {route_index}.")
+            logger.debug("Swapping nodes %s and %s in route %s.", route[node_index + 1], route[node_index + 2],
+                         route_index)
 
             # Check feasibility of the new route
-            if is_feasible(new_route, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+            if schedules is not None:
+                feasible = schedules.can_swap_adjacent(route_index, route, node_index + 1)
+            else:
+                feasible = is_feasible(new_route, demand, capacity, ready_time, due_time, service_time, distance_matrix)
+            if feasible:
                 new_routes[route_index] = new_route
-                print(f"Feasible route after swap: {new_routes}.")
-                return new_routes
+                logger.debug("Feasible route after swap: %s.", new_routes)
+                return new_routes, adjacent_swap_delta(route, node_index + 1, distance_matrix)
             else:
-                print("Infeasible route after swap. Reverting.")
+                logger.debug("Infeasible route after swap. Reverting.")
+                count_infeasible("swap")
 
-    return routes
+    return routes, 0
 
 
 #### Relocation
-def relocation(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
-    print("Relocation process started.")
+def relocation(routes, demand, capacity, ready_time, due_time, service_time, distance_matrix, schedules=None,
+               neighbors=None):
+    """
+    Move a random customer to a random position of another route.
+    Returns the routes and the change in total distance, which is 0 when the move is not applied.
+    With the RouteSchedules of the routes, feasibility is checked in constant time.
+    With nearest neighbour lists, the customer is moved next to one of its neighbours instead.
+    """
+    logger.debug("Relocation process started.")
 
     num_routes = len(routes)
 
-    # Select two different random routes
-    route_indices = random.sample(range(num_routes), 2)
-    route1_index, route2_index = route_indices[0], route_indices[1]
-    route1, route2 = routes[route1_index], routes[route2_index]
-
-    # Ensure both routes have more than two nodes (excluding depots)
-    if len(route1) <= 2 or len(route2) <= 2:
-        print("Routes are too short to apply Relocation.")
-        return routes
-
-    # Randomly select a customer (excluding depot) to move from route1 to route2
-    customer_index = random.randint(1, len(route1) - 2)
+    if neighbors is not None:
+        move = select_granular_relocation(routes, neighbors, schedules)
+        if move is None:
+            logger.debug("No neighbour on another route to apply Relocation.")
+            return routes, 0
+        route1_index, customer_index, route2_index, insert_index = move
+        route1, route2 = routes[route1_index], routes[route2_index]
+    else:
+        if num_routes < 2:
+            logger.debug("A single route, nothing to apply Relocation to.")
+            return routes, 0
+
+        # Select two different random routes
+        route_indices = random.sample(range(num_routes), 2)
+        route1_index, route2_index = route_indices[0], route_indices[1]
+        route1, route2 = routes[route1_index], routes[route2_index]
+
+        # Ensure both routes have more than two nodes (excluding depots)
+        if len(route1) <= 2 or len(route2) <= 2:
+            logger.debug("Routes are too short to apply Relocation.")
+            return routes, 0
+
+        # Randomly select a customer (excluding depot) to move from route1 to a random position of route2
+        customer_index = random.randint(1, len(route1) - 2)
+        insert_index = random.randint(1, len(route2) - 1)
     customer = route1[customer_index]
 
     # Create new routes for feasibility check
     new_route1 = route1[:customer_index] + route1[customer_index + 1:]
-    new_route2 = route2[:]
-    new_route2.insert(random.randint(1, len(new_route2) - 1), customer)
+    new_route2 = route2[:insert_index] + [customer] + route2[insert_index:]
 
     # Check if the new routes are feasible
-    if is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
-            is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+    if schedules is not None:
+        feasible = schedules.can_remove(route1_index, route1, customer_index) and \
+            schedules.can_insert(route2_index, route2, insert_index, customer)
+    else:
+        feasible = is_feasible(new_route1, demand, capacity, ready_time, due_time, service_time, distance_matrix) and \
+            is_feasible(new_route2, demand, capacity, ready_time, due_time, service_time, distance_matrix)
+    if feasible:
         routes[route1_index] = new_route1
         routes[route2_index] = new_route2
-        print(
-            f"Relocation applied successfully. Moved customer {customer} from route {route1_index} to route {route2_index}.")
+        logger.debug("Relocation applied successfully. Moved customer %s from route %s to route %s.", customer,
+                     route1_index, route2_index)
+        return routes, removal_delta(route1, customer_index, distance_matrix) + \
+            insertion_delta(route2, insert_index, customer, distance_matrix)
     else:
-        print(f"Relocation resulted in infeasible routes. Reverting.")
+        logger.debug("Relocation resulted in infeasible routes. Reverting.")
+        count_infeasible("relocation")
 
-    return routes
+    return routes, 0
@@ -0,0 +1,141 @@
+import json
+import os
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import numpy as np
+from sklearn.model_selection import ParameterGrid
+
+from src.instance.instance import Instance, get_instance, get_instance_file, get_instance_name, instances
+from src.simulatedAnnealing.calculations import get_distance_matrix, distance_matrices
+from src.utils.plots import wait_for_plots
+
+path_to_repo = Path(__file__).parent.parent.resolve()  # This is the path to the repository
+
+instance_arrays = ["id", "locations", "demand", "ready_time", "due_time", "service_time"]
+
+# Shared memory blocks attached by this worker process, kept open for the lifetime of the worker
+attached_blocks = []
+
+
+def share_arrays(arrays):
+    """
+    Copy named arrays into shared memory blocks.
+    Returns the blocks, which the caller must close and unlink, and a picklable description of them.
+    """
+    blocks = []
+    shared_arrays = {}
+    for name, array in arrays.items():
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        shared_arrays[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, shared_arrays
+
+
+def attach_arrays(shared_arrays):
+    """
+    Views of arrays shared with share_arrays. The blocks stay open for the lifetime of the worker.
+    """
+    arrays = {}
+    for name, (block_name, shape, dtype) in shared_arrays.items():
+        block = SharedMemory(name=block_name)
+        attached_blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    return arrays
+
+
+def share_instance(dataset):
+    """
+    Copy the instance arrays and the distance matrix into shared memory blocks.
+    Returns the blocks, which the caller must close and unlink, and a picklable description of them.
+    """
+    data = get_instance(dataset)
+    arrays = {name: getattr(data, name) for name in instance_arrays}
+    arrays["distance_matrix"] = get_distance_matrix(dataset)
+    blocks, shared_arrays = share_arrays(arrays)
+
+    descriptor = {
+        "dataset": dataset,
+        "num_vehicles": data.num_vehicles,
+        "capacity": data.capacity,
+        "arrays": shared_arrays
+    }
+    return blocks, descriptor
+
+
+def attach_shared_instance(descriptor):
+    """
+    Pool initializer: register the shared instance and distance matrix in this worker, so get_instance and
+    get_distance_matrix return views of the shared memory instead of parsing and computing them again.
+    """
+    arrays = attach_arrays(descriptor["arrays"])
+
+    dataset = descriptor["dataset"]
+    filename = get_instance_file(dataset)
+    distance_matrix = arrays.pop("distance_matrix")
+    distance_matrix.flags.writeable = False
+    instances[filename] = Instance(instance=dataset, num_vehicles=descriptor["num_vehicles"],
+                                   capacity=descriptor["capacity"], **arrays)
+    distance_matrices[str(filename)] = distance_matrix
+
+
+def run_job(job):
+    """
+    Solve the instance with one parameter combination and seed, returning a JSON-ready summary of the run.
+    """
+    solver, config_class, dataset, param, seed = job
+    solution = solver(dataset, config_class(**param, seed=seed))
+    # Pool workers are terminated without waiting for their plot thread
+    wait_for_plots()
+    return {
+        **param,
+        "seed": seed,
+        "algorithm": solution.algorithm,
+        "initial_distance": float(solution.initial_distance),
+        "best_distance": float(solution.best_distance),
+        "runtime": solution.runtime,
+        "best_routes": [[int(node) for node in route] for route in solution.best_routes],
+        "stats": solution.stats
+    }
+
+
+def run_sweep(dataset, solver, config_class, params, seeds=(0,), workers=None, name="sweep"):
+    """
+    Run solver on the dataset for every combination of the parameter grid and every seed over a process pool.
+    The workers share the instance and the distance matrix through shared memory, and the summary of each run
+    is appended to results/<name>_<dataset>.jsonl as soon as it finishes. Returns the summaries.
+    """
+    jobs = [(solver, config_class, dataset, param, seed) for param in ParameterGrid(params) for seed in seeds]
+    workers = workers or os.cpu_count()
+
+    final_path = path_to_repo / "results"
+    if not os.path.exists(final_path):
+        os.makedirs(final_path)
+    results_file_path = final_path / f"{name}_{get_instance_name(dataset)}.jsonl"
+
+    results = []
+    blocks, descriptor = share_instance(dataset)
+    try:
+        with open(results_file_path, 'a', encoding='utf-8') as results_file:
+            def record(summary):
+                results_file.write(json.dumps(summary, default=str) + "\n")
+                results_file.flush()
+                results.append(summary)
+                print(f"Sweep {len(results)}/{len(jobs)}: best distance {summary['best_distance']}")
+
+            if workers == 1:
+                for summary in map(run_job, jobs):
+                    record(summary)
+            else:
+                with Pool(workers, initializer=attach_shared_instance, initargs=(descriptor,)) as pool:
+                    for summary in pool.imap_unordered(run_job, jobs):
+                        record(summary)
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    print(f"Sweep results saved as {results_file_path}")
+    return results
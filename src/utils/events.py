@@ -0,0 +1,41 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict
+
+# Solver hot paths log here at DEBUG level with lazy %-style arguments, so nothing is formatted or written unless
+# the level is enabled, e.g. with logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("vrptw")
+
+
+@dataclass
+class RunStats:
+    """
+    Counters of one solver run, attached to its Solution.
+    """
+    proposals: int = 0
+    improving_accepts: int = 0
+    uphill_accepts: int = 0
+    uphill_rejects: int = 0
+    # Proposals that leave the distance unchanged, including infeasible moves and moves the operator did not apply
+    neutral_moves: int = 0
+    infeasible_rejects: Dict[str, int] = field(default_factory=dict)
+
+
+# Counters of the run in progress in this process
+run_stats = RunStats()
+
+
+def start_run() -> RunStats:
+    global run_stats
+    run_stats = RunStats()
+    return run_stats
+
+
+def resume_run(stats: RunStats) -> RunStats:
+    global run_stats
+    run_stats = stats
+    return run_stats
+
+
+def count_infeasible(operator, count=1):
+    run_stats.infeasible_rejects[operator] = run_stats.infeasible_rejects.get(operator, 0) + count
@@ -1,8 +1,13 @@
+from dataclasses import dataclass
+from math import inf
+
+from src.utils.events import logger
+
 
 def is_feasible(route, demand, capacity, ready_time, due_time, service_time, distance_matrix):
     current_time = 0
     total_demand = 0
-    print(f"Checking feasibility of route {route}.")
+    logger.debug("Checking feasibility of route %s.", route)
     for i in range(1, len(route) - 1):
         customer = route[i]
         total_demand += demand[customer]
@@ -15,7 +20,163 @@ def is_feasible(route, demand, capacity, ready_time, due_time, service_time, dis
         current_time += service_time[customer]
     result = total_demand <= capacity
     if result:
-        print(f"Route {route} is feasible.")
+        logger.debug("Route %s is feasible.", route)
     else:
-        print(f"Route {route} is not feasible due to capacity constraints.")
+        logger.debug("Route %s is not feasible due to capacity constraints.", route)
     return result
+
+
+@dataclass
+class RouteSchedule:
+    """
+    Cached timing of one route. departure[i] is the time the vehicle leaves position i, valid for the positions
+    before first_violation (the first customer reached after its due time). latest_start[i] is the latest time
+    service can start at position i without violating a later time window (-inf if none is possible).
+    load is the demand of the visited customers.
+    """
+    route: list
+    departure: list
+    latest_start: list
+    first_violation: int
+    load: float
+
+
+class RouteSchedules:
+    """
+    Schedules of the routes of the current solution. They check an insertion, removal or swap for time windows
+    and capacity in constant time, with the same result as is_feasible on the modified route. Call update after a
+    move is accepted so the routes it replaced get a new schedule. They also index the route and position of every
+    customer, see locate.
+    """
+
+    def __init__(self, routes, demand, capacity, ready_time, due_time, service_time, distance_matrix):
+        self.demand = demand
+        self.capacity = capacity
+        self.ready_time = ready_time
+        self.due_time = due_time
+        self.service_time = service_time
+        self.distance_matrix = distance_matrix
+        self.schedules = [self.build(route) for route in routes]
+        self.route_of = [0] * len(demand)
+        self.position_of = [0] * len(demand)
+        for route_index, route in enumerate(routes):
+            self.index(route_index, route)
+
+    def build(self, route) -> RouteSchedule:
+        # Like is_feasible, the first and the last node of the route are not checked
+        last = len(route) - 1
+        departure = [0] * last
+        first_violation = last
+        for i in range(1, last):
+            departure_time = self.visit(departure[i - 1], route[i - 1], route[i])
+            if departure_time is None:
+                first_violation = i
+                break
+            departure[i] = departure_time
+
+        latest_start = [inf] * (last + 1)
+        for i in range(last - 1, 0, -1):
+            customer = route[i]
+            latest = min(self.due_time[customer],
+                         latest_start[i + 1] - self.service_time[customer] - self.distance_matrix[customer, route[i + 1]])
+            latest_start[i] = latest if self.ready_time[customer] <= latest else -inf
+
+        load = sum(self.demand[customer] for customer in route[1:last])
+        return RouteSchedule(route, departure, latest_start, first_violation, load)
+
+    def index(self, route_index, route):
+        for position in range(1, len(route) - 1):
+            self.route_of[route[position]] = route_index
+            self.position_of[route[position]] = position
+
+    def update(self, routes):
+        # Operators replace the routes they change with new lists, so unchanged routes keep their schedule
+        for route_index, route in enumerate(routes):
+            if self.schedules[route_index].route is not route:
+                self.schedules[route_index] = self.build(route)
+                self.index(route_index, route)
+
+    def locate(self, routes, customer):
+        """
+        Index of the route that visits customer and the position of the customer in it, or None when that route
+        was changed since the last update.
+        """
+        route_index = self.route_of[customer]
+        if routes[route_index] is not self.schedules[route_index].route:
+            return None
+        return route_index, self.position_of[customer]
+
+    def get(self, route_index, route) -> RouteSchedule:
+        schedule = self.schedules[route_index]
+        if schedule.route is route:
+            return schedule
+        # The route was changed by an earlier operator of the same move
+        return self.build(route)
+
+    def visit(self, departure_time, previous, customer):
+        """
+        Time the vehicle leaves customer when it leaves previous at departure_time, or None if it arrives too late.
+        """
+        current_time = departure_time + self.distance_matrix[previous, customer]
+        if current_time < self.ready_time[customer]:
+            current_time = self.ready_time[customer]
+        if current_time > self.due_time[customer]:
+            return None
+        return current_time + self.service_time[customer]
+
+    def can_insert(self, route_index, route, position, customer):
+        """
+        Whether customer can be inserted in front of the node at position.
+        """
+        schedule = self.get(route_index, route)
+        if position - 1 >= schedule.first_violation or schedule.load + self.demand[customer] > self.capacity:
+            return False
+        departure_time = self.visit(schedule.departure[position - 1], route[position - 1], customer)
+        if departure_time is None:
+            return False
+        return departure_time + self.distance_matrix[customer, route[position]] <= schedule.latest_start[position]
+
+    def can_remove(self, route_index, route, position):
+        """
+        Whether the customer at position can be removed.
+        """
+        schedule = self.get(route_index, route)
+        if position - 1 >= schedule.first_violation or \
+                schedule.load - self.demand[route[position]] > self.capacity:
+            return False
+        arrival_time = schedule.departure[position - 1] + self.distance_matrix[route[position - 1], route[position + 1]]
+        return arrival_time <= schedule.latest_start[position + 1]
+
+    def can_replace(self, route_index, route, position, customer):
+        """
+        Whether the node at position can be replaced by customer.
+        """
+        schedule = self.get(route_index, route)
+        last = len(route) - 1
+        if position == last:
+            # The last node is neither checked nor counted in the load
+            return schedule.first_violation == last and schedule.load <= self.capacity
+        if position - 1 >= schedule.first_violation or \
+                schedule.load - self.demand[route[position]] + self.demand[customer] > self.capacity:
+            return False
+        departure_time = self.visit(schedule.departure[position - 1], route[position - 1], customer)
+        if departure_time is None:
+            return False
+        return departure_time + self.distance_matrix[customer, route[position + 1]] <= \
+            schedule.latest_start[position + 1]
+
+    def can_swap_adjacent(self, route_index, route, position):
+        """
+        Whether the nodes at position and position + 1 can swap places.
+        """
+        schedule = self.get(route_index, route)
+        if position - 1 >= schedule.first_violation or schedule.load > self.capacity:
+            return False
+        first, second = route[position], route[position + 1]
+        departure_time = self.visit(schedule.departure[position - 1], route[position - 1], second)
+        if departure_time is None:
+            return False
+        departure_time = self.visit(departure_time, second, first)
+        if departure_time is None:
+            return False
+        return departure_time + self.distance_matrix[first, route[position + 2]] <= schedule.latest_start[position + 2]
@@ -0,0 +1,136 @@
+import numpy as np
+
+
+class GiantTour:
+    """
+    Array-backed solution: all routes, each with its start and end depot, concatenated in one int array.
+    offsets[r]:offsets[r + 1] is the slice of route r, index_of[customer] is the position of a customer in the giant
+    tour and route_of[customer] its route. The load and the distance of every route are cached.
+    Moves change the arrays in place and are recorded in an undo log, so a rejected move is reverted with undo()
+    and an accepted one is kept with commit(), without copying the solution.
+    Only the batched moves work on a GiantTour: the sequential operators keep a list of routes and each proposal
+    copies that list and the routes it changes.
+    """
+
+    def __init__(self, routes, demand, distance_matrix):
+        self.demand = demand
+        self.distance_matrix = distance_matrix
+        self.tour = np.array([node for route in routes for node in route], dtype=np.int64)
+        self.offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(route) for route in routes])
+        # Only meaningful for customers, the depot appears at both ends of every route
+        self.index_of = np.zeros(len(demand), dtype=np.int64)
+        self.index_of[self.tour] = np.arange(len(self.tour))
+        self.route_of = np.zeros(len(demand), dtype=np.int64)
+        self.route_of[self.tour] = np.repeat(np.arange(len(routes)), np.diff(self.offsets))
+        self.loads = np.array([demand[route].sum() for route in routes], dtype=float)
+        self.costs = np.array([distance_matrix[route[:-1], route[1:]].sum() for route in routes])
+        self.log = []
+
+    @property
+    def num_routes(self):
+        return len(self.offsets) - 1
+
+    @property
+    def distance(self):
+        return self.costs.sum()
+
+    def route(self, route_index):
+        # A view of the route, only valid until the next move
+        return self.tour[self.offsets[route_index]:self.offsets[route_index + 1]]
+
+    def position(self, customer):
+        return self.index_of[customer] - self.offsets[self.route_of[customer]]
+
+    def to_routes(self):
+        return [self.route(route_index).tolist() for route_index in range(self.num_routes)]
+
+    def reindex(self, start, end):
+        self.index_of[self.tour[start:end]] = np.arange(start, end)
+
+    def relocate(self, route1, position1, route2, position2, record=True):
+        """
+        Move the customer at position1 of route1 in front of the node at position2 of route2.
+        Returns the change in total distance.
+        """
+        source = self.offsets[route1] + position1
+        customer = self.tour[source]
+        previous1, following1 = self.tour[source - 1], self.tour[source + 1]
+        target = self.offsets[route2] + position2
+        previous2, following2 = self.tour[target - 1], self.tour[target]
+        if record:
+            self.log.append(("relocate", route1, position1, route2, position2,
+                             float(self.costs[route1]), float(self.costs[route2])))
+        removal = self.distance_matrix[previous1, following1] - self.distance_matrix[previous1, customer] - \
+            self.distance_matrix[customer, following1]
+        insertion = self.distance_matrix[previous2, customer] + self.distance_matrix[customer, following2] - \
+            self.distance_matrix[previous2, following2]
+
+        if source < target:
+            self.tour[source:target - 1] = self.tour[source + 1:target]
+            self.tour[target - 1] = customer
+            self.offsets[route1 + 1:route2 + 1] -= 1
+            self.reindex(source, target)
+        else:
+            self.tour[target + 1:source + 1] = self.tour[target:source]
+            self.tour[target] = customer
+            self.offsets[route2 + 1:route1 + 1] += 1
+            self.reindex(target, source + 1)
+        self.route_of[customer] = route2
+        self.loads[route1] -= self.demand[customer]
+        self.loads[route2] += self.demand[customer]
+        self.costs[route1] += removal
+        self.costs[route2] += insertion
+        return removal + insertion
+
+    def swap(self, route1, position1, route2, position2, record=True):
+        """
+        Exchange the customer at position1 of route1 with the one at position2 of route2.
+        Returns the change in total distance.
+        """
+        index1 = self.offsets[route1] + position1
+        index2 = self.offsets[route2] + position2
+        customer1, customer2 = self.tour[index1], self.tour[index2]
+        if record:
+            self.log.append(("swap", route1, position1, route2, position2,
+                             float(self.costs[route1]), float(self.costs[route2])))
+        delta1 = self.distance_matrix[self.tour[index1 - 1], customer2] + \
+            self.distance_matrix[customer2, self.tour[index1 + 1]] - \
+            self.distance_matrix[self.tour[index1 - 1], customer1] - self.distance_matrix[customer1, self.tour[index1 + 1]]
+        delta2 = self.distance_matrix[self.tour[index2 - 1], customer1] + \
+            self.distance_matrix[customer1, self.tour[index2 + 1]] - \
+            self.distance_matrix[self.tour[index2 - 1], customer2] - self.distance_matrix[customer2, self.tour[index2 + 1]]
+
+        self.tour[index1], self.tour[index2] = customer2, customer1
+        self.index_of[customer1], self.index_of[customer2] = index2, index1
+        self.route_of[customer1], self.route_of[customer2] = route2, route1
+        load_change = self.demand[customer2] - self.demand[customer1]
+        self.loads[route1] += load_change
+        self.loads[route2] -= load_change
+        self.costs[route1] += delta1
+        self.costs[route2] += delta2
+        return delta1 + delta2
+
+    def touched_routes(self):
+        """
+        The routes changed by the moves since the last commit.
+        """
+        return sorted({route for _, route1, _, route2, _, _, _ in self.log for route in (route1, route2)})
+
+    def undo(self):
+        """
+        Revert the moves since the last commit, newest first.
+        """
+        while self.log:
+            move, route1, position1, route2, position2, cost1, cost2 = self.log.pop()
+            if move == "relocate":
+                # The customer now sits at position2 of route2
+                self.relocate(route2, position2, route1, position1, record=False)
+            else:
+                self.swap(route1, position1, route2, position2, record=False)
+            # Restore the cached costs exactly instead of accumulating rounding errors
+            self.costs[route1] = cost1
+            self.costs[route2] = cost2
+
+    def commit(self):
+        self.log.clear()
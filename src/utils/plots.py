@@ -1,115 +1,148 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.image import imsave
 
-from src.instance.instance import get_instance
+from src.instance.instance import get_instance, get_instance_file, get_instance_name
+from src.utils.events import logger
+from src.utils.save import seed_suffix
 
 path_to_repo = Path(__file__).parent.parent.parent.resolve()  # This is the path to the repository
 
+# Agg canvas of every instance plotted in this process with its customers already rendered, by instance file.
+# Only the plot thread uses them
+backgrounds = {}
 
-def visualize_routes_sa(dataset, current_routes, sa, show=False, save=False):
-    """
-    Visualize the vehicle routes using matplotlib.
-    """
-    instance = get_instance(dataset)
-    plt.figure(figsize=(10, 10))
+# Saved plots are rendered by one background thread of this process, so solvers return without waiting for them
+plot_executor = None
+plot_executor_pid = None
+pending_plots = []
 
-    # Plot each customer
+
+def draw_customers(axes, instance):
+    axes.scatter(instance.locations[:, 0], instance.locations[:, 1], c='blue')
     for customer_id, (x, y) in zip(instance.id, instance.locations):
-        plt.scatter(x, y, c='blue')
-        plt.text(x, y, str(customer_id), fontsize=12, ha='right')
+        axes.text(x, y, str(customer_id), fontsize=12, ha='right')
+    axes.set_xlabel('X Coordinate')
+    axes.set_ylabel('Y Coordinate')
+    axes.set_title('Vehicle Routes')
+    axes.grid(True)
+
 
-    # Plot each route
+def draw_routes(axes, instance, current_routes):
+    """
+    Line of every route, back to the depot. Returns the lines.
+    """
+    lines = []
     for route_index, route in enumerate(current_routes):
-        route_coordinates = [instance.locations[node] for node in route]
-        route_coordinates.append(route_coordinates[0])  # To complete the loop to the depot
-        xs, ys = zip(*route_coordinates)
-        plt.plot(xs, ys, marker='o', label=f'Route {route_index + 1}')
-
-    plt.xlabel('X Coordinate')
-    plt.ylabel('Y Coordinate')
-    plt.title('Vehicle Routes')
-    plt.legend()
-    plt.grid(True)
-    if save:
-        path_to_plots = path_to_repo / 'plots'
-        file_name = (f"plot_{dataset}_nodes_{sa.neighborhood_selection}_{sa.cooling_schedule}"
-                     f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}.png")
-        if not path_to_plots.exists():
-            path_to_plots.mkdir()
-        plt.savefig(path_to_plots / file_name)
-        print(f"Plot saved as {file_name}")
-    if show:
-        plt.show()
+        route_coordinates = instance.locations[list(route) + [route[0]]]  # To complete the loop to the depot
+        lines += axes.plot(route_coordinates[:, 0], route_coordinates[:, 1], marker='o',
+                           label=f'Route {route_index + 1}')
+    return lines
 
 
-def visualize_routes_sa_soft(dataset, current_routes, sa, show=False, save=False):
+def get_background(dataset):
+    """
+    Canvas, axes and rendered background of the instance plot: customers, labels, axes and grid. The axes limits
+    are fixed to the customers, which every route stays within.
+    """
+    key = str(get_instance_file(dataset))
+    if key not in backgrounds:
+        figure = Figure(figsize=(10, 10))
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        draw_customers(axes, get_instance(dataset))
+        axes.set_xlim(axes.get_xlim())
+        axes.set_ylim(axes.get_ylim())
+        canvas.draw()
+        backgrounds[key] = (canvas, axes, canvas.copy_from_bbox(figure.bbox))
+    return backgrounds[key]
+
+
+def render_routes(dataset, current_routes, file_path):
     """
-    Visualize the vehicle routes using matplotlib.
+    Save the routes drawn over the cached background of the instance as a PNG.
     """
-    instance = get_instance(dataset)
-    plt.figure(figsize=(10, 10))
+    canvas, axes, background = get_background(dataset)
+    canvas.restore_region(background)
+    # Every plot starts from the first color of the cycle
+    axes.set_prop_cycle(None)
+    artists = draw_routes(axes, get_instance(dataset), current_routes)
+    artists.append(axes.legend())
+    for artist in artists:
+        axes.draw_artist(artist)
+    imsave(file_path, np.asarray(canvas.buffer_rgba()))
+    for artist in artists:
+        artist.remove()
+    print(f"Plot saved as {os.path.basename(file_path)}")
+
+
+def report_plot_error(future):
+    if future.exception() is not None:
+        logger.error("Plot failed: %s", future.exception())
+
+
+def wait_for_plots():
+    """
+    Wait until the plots submitted in this process are saved, raising the error of the first one that failed.
+    """
+    while pending_plots:
+        pending_plots.pop(0).result()
 
-    # Plot each customer
-    for customer_id, (x, y) in zip(instance.id, instance.locations):
-        plt.scatter(x, y, c='blue')
-        plt.text(x, y, str(customer_id), fontsize=12, ha='right')
 
-    # Plot each route
-    for route_index, route in enumerate(current_routes):
-        route_coordinates = [instance.locations[node] for node in route]
-        route_coordinates.append(route_coordinates[0])  # To complete the loop to the depot
-        xs, ys = zip(*route_coordinates)
-        plt.plot(xs, ys, marker='o', label=f'Route {route_index + 1}')
-
-    plt.xlabel('X Coordinate')
-    plt.ylabel('Y Coordinate')
-    plt.title('Vehicle Routes')
-    plt.legend()
-    plt.grid(True)
-    if save:
-        path_to_plots = path_to_repo / 'plots_soft'
-        file_name = (f"plot_{dataset}_nodes_{sa.neighborhood_selection}_{sa.cooling_schedule}"
-                     f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
-                     f"_p_too_early{sa.penalty_too_early}_p_too_late_{sa.penalty_too_late}_total_p_{sa.total_penalty}.png")
-        if not path_to_plots.exists():
-            path_to_plots.mkdir()
-        plt.savefig(path_to_plots / file_name)
-        print(f"Plot saved as {file_name}")
+def plot_routes(dataset, current_routes, path_to_plots, file_name, show=False, save=False):
+    global plot_executor, plot_executor_pid
     if show:
+        instance = get_instance(dataset)
+        figure, axes = plt.subplots(figsize=(10, 10))
+        draw_customers(axes, instance)
+        draw_routes(axes, instance, current_routes)
+        axes.legend()
         plt.show()
+        plt.close(figure)
+    if save:
+        path_to_plots.mkdir(exist_ok=True)
+        # A forked worker process does not inherit the plot thread of its parent
+        if plot_executor is None or plot_executor_pid != os.getpid():
+            plot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plots")
+            plot_executor_pid = os.getpid()
+            pending_plots.clear()
+        pending_plots[:] = [future for future in pending_plots if not future.done()]
+        future = plot_executor.submit(render_routes, dataset, [list(route) for route in current_routes],
+                                      path_to_plots / file_name)
+        future.add_done_callback(report_plot_error)
+        pending_plots.append(future)
 
 
-def visualize_routes(dataset, current_routes, name, show=False, save=False):
+def visualize_routes_sa(dataset, current_routes, sa, show=False, save=False):
     """
-    Visualize the vehicle routes using matplotlib.
+    Visualize the vehicle routes using matplotlib. Saving happens in the background, see wait_for_plots.
     """
-    instance = get_instance(dataset)
-    plt.figure(figsize=(10, 10))
+    file_name = (f"plot_{get_instance_name(dataset)}_nodes_{sa.neighborhood_selection}_{sa.cooling_schedule}"
+                 f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
+                 f"{seed_suffix(sa)}.png")
+    plot_routes(dataset, current_routes, path_to_repo / 'plots', file_name, show, save)
 
-    # Plot each customer
-    for customer_id, (x, y) in zip(instance.id, instance.locations):
-        plt.scatter(x, y, c='blue')
-        plt.text(x, y, str(customer_id), fontsize=12, ha='right')
 
-    # Plot each route
-    for route_index, route in enumerate(current_routes):
-        route_coordinates = [instance.locations[node] for node in route]
-        route_coordinates.append(route_coordinates[0])  # To complete the loop to the depot
-        xs, ys = zip(*route_coordinates)
-        plt.plot(xs, ys, marker='o', label=f'Route {route_index + 1}')
-
-    plt.xlabel('X Coordinate')
-    plt.ylabel('Y Coordinate')
-    plt.title('Vehicle Routes')
-    plt.legend()
-    plt.grid(True)
-    if save:
-        path_to_plots = path_to_repo / 'plots'
-        file_name = f"{dataset}_nodes_{name}.png"
-        if not path_to_plots.exists():
-            path_to_plots.mkdir()
-        plt.savefig(path_to_plots / file_name)
-        print(f"Plot saved as {file_name}")
-    if show:
-        plt.show()
+def visualize_routes_sa_soft(dataset, current_routes, sa, show=False, save=False):
+    """
+    Visualize the vehicle routes using matplotlib. Saving happens in the background, see wait_for_plots.
+    """
+    file_name = (f"plot_{get_instance_name(dataset)}_nodes_{sa.neighborhood_selection}_{sa.cooling_schedule}"
+                 f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
+                 f"_p_too_early{sa.penalty_too_early}_p_too_late_{sa.penalty_too_late}_total_p_{sa.total_penalty}"
+                 f"{seed_suffix(sa)}.png")
+    plot_routes(dataset, current_routes, path_to_repo / 'plots_soft', file_name, show, save)
+
+
+def visualize_routes(dataset, current_routes, name, show=False, save=False):
+    """
+    Visualize the vehicle routes using matplotlib. Saving happens in the background, see wait_for_plots.
+    """
+    file_name = f"{get_instance_name(dataset)}_nodes_{name}.png"
+    plot_routes(dataset, current_routes, path_to_repo / 'plots', file_name, show, save)
@@ -0,0 +1,120 @@
+import cProfile
+import os
+import pstats
+from time import perf_counter
+
+# Route schedule checks made by the operators of the hard time window search, see RouteSchedules
+SCHEDULE_CHECKS = ["can_insert", "can_remove", "can_replace", "can_swap_adjacent"]
+
+
+class PhaseProfiler:
+    """
+    Wall-clock seconds spent in each phase of a solver run and the outcome of the moves of each operator.
+    The solver calls lap at the end of every phase, which adds the time since the previous lap to it. Functions
+    timed with instrument or instrument_methods count as a phase of their own and are left out of the phase that called them.
+    With the "cprofile" mode the search loop is also captured with cProfile, which slows every call down, the
+    phase times included. A profiler without a mode records nothing.
+    """
+
+    def __init__(self, mode=None):
+        if mode not in [None, "phases", "cprofile"]:
+            raise ValueError("Profile must be either None, 'phases' or 'cprofile'")
+        self.mode = mode
+        self.enabled = mode is not None
+        self.seconds = {}
+        self.operators = {}
+        self.clock = perf_counter()
+        # Time of the instrumented functions since the last lap
+        self.nested = 0.0
+        self.capture = None
+
+    def __getstate__(self):
+        # A checkpointed profiler goes on from the phases it recorded, without the cProfile capture
+        state = self.__dict__.copy()
+        state["capture"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.restart()
+
+    def restart(self):
+        self.clock = perf_counter()
+        self.nested = 0.0
+
+    def lap(self, phase):
+        if not self.enabled:
+            return
+        now = perf_counter()
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + now - self.clock - self.nested
+        self.clock = now
+        self.nested = 0.0
+
+    def timed(self, function, phase):
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self.seconds[phase] = self.seconds.get(phase, 0.0) + elapsed
+                self.nested += elapsed
+
+        return timed_function
+
+    def instrument(self, function, phase):
+        """
+        The function, timed as the phase while the profiler records.
+        """
+        return self.timed(function, phase) if self.enabled else function
+
+    def instrument_methods(self, owner, names, phase):
+        """
+        Time the named methods of the object as the phase from now on.
+        """
+        if self.enabled:
+            for name in names:
+                setattr(owner, name, self.timed(getattr(owner, name), phase))
+
+    def count(self, operator, outcome):
+        if not self.enabled:
+            return
+        outcomes = self.operators.setdefault(operator, {})
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def start_capture(self):
+        if self.mode == "cprofile":
+            self.capture = cProfile.Profile()
+            self.capture.enable()
+
+    def stop_capture(self):
+        if self.capture is not None:
+            self.capture.disable()
+
+    def summary(self, profile_file_path=None, top=20):
+        """
+        Seconds and share of the recorded time of every phase and the outcomes of every operator, for the stats of
+        the Solution. A cProfile capture is saved to profile_file_path, and its top functions by cumulative time
+        are listed.
+        """
+        if not self.enabled:
+            return None
+        total = sum(self.seconds.values())
+        summary = {
+            "mode": self.mode,
+            "seconds": dict(self.seconds),
+            "shares": {phase: seconds / total if total else 0.0 for phase, seconds in self.seconds.items()},
+            "operators": {operator: dict(outcomes) for operator, outcomes in self.operators.items()}
+        }
+        if self.capture is not None:
+            statistics = pstats.Stats(self.capture)
+            functions = sorted(statistics.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+            summary["functions"] = [
+                {"function": f"{os.path.basename(file_name)}:{line}({name})", "calls": calls,
+                 "total_seconds": total_seconds, "cumulative_seconds": cumulative_seconds}
+                for (file_name, line, name), (_, calls, total_seconds, cumulative_seconds, _) in functions]
+            if profile_file_path is not None:
+                os.makedirs(os.path.dirname(profile_file_path), exist_ok=True)
+                statistics.dump_stats(profile_file_path)
+                summary["profile_file"] = os.path.basename(profile_file_path)
+        return summary
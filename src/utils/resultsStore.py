@@ -0,0 +1,138 @@
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from src.instance.instance import get_instance_name
+
+path_to_repo = Path(__file__).parent.parent.parent.resolve()  # This is the path to the repository
+results_store_path = path_to_repo / "results" / "results.sqlite"
+
+# Configuration fields with a column of their own, the full configuration is also kept as JSON
+parameter_columns = {
+    "starting_method": "TEXT",
+    "neighborhood_selection": "TEXT",
+    "cooling_schedule": "TEXT",
+    "initial_temperature": "REAL",
+    "alpha": "REAL",
+    "final_temperature": "REAL",
+    "constant_k": "REAL",
+    "neighborhood_size": "INTEGER",
+    "seed": "INTEGER"
+}
+
+# Parameters that identify earlier runs with the same configuration, as in the former results file names
+run_key = ["neighborhood_selection", "cooling_schedule", "initial_temperature", "alpha", "constant_k",
+           "neighborhood_size", "seed"]
+
+schema = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    {", ".join(f"{name} {column_type}" for name, column_type in parameter_columns.items())},
+    initial_distance REAL,
+    best_distance REAL,
+    runtime REAL,
+    termination TEXT,
+    traces_file TEXT,
+    parameters TEXT NOT NULL,
+    solution TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_distance ON runs (dataset, algorithm, best_distance);
+CREATE INDEX IF NOT EXISTS runs_by_parameters ON runs (dataset, algorithm, {", ".join(run_key)});
+"""
+
+
+# Stores whose schema this process created or found, so later connections skip it
+initialised_stores = set()
+
+
+def connect(store_path=None):
+    """
+    Open the results store, creating it if needed. Write-ahead logging lets readers and the writers of parallel
+    sweep workers use the store at the same time; writers wait for each other for up to a minute.
+    The schema and the journal mode, which is kept in the file, are set up once per store and process.
+    """
+    store_path = Path(store_path or results_store_path)
+    initialised = store_path in initialised_stores and store_path.exists()
+    if not initialised:
+        store_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(store_path, timeout=60)
+    connection.row_factory = sqlite3.Row
+    # Not kept in the file, but only changes how commits are synced
+    connection.execute("PRAGMA synchronous=NORMAL")
+    if not initialised:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(schema)
+        initialised_stores.add(store_path)
+    return connection
+
+
+def append_result(dataset, algorithm, parameters, solution_data, store_path=None):
+    """
+    Append one run to the results store: the configuration and the JSON-ready solution data. Returns its id.
+    """
+    columns = {
+        "created": datetime.now().isoformat(),
+        "dataset": get_instance_name(dataset),
+        "algorithm": algorithm,
+        **{name: parameters.get(name) for name in parameter_columns},
+        "initial_distance": float(solution_data["initial_distance"]),
+        "best_distance": float(solution_data["best_distance"]),
+        "runtime": solution_data["runtime"],
+        "termination": solution_data.get("termination"),
+        "traces_file": solution_data.get("traces_file"),
+        "parameters": json.dumps(parameters, ensure_ascii=False, default=str),
+        "solution": json.dumps(solution_data, ensure_ascii=False, default=str)
+    }
+    connection = connect(store_path)
+    try:
+        with connection:
+            cursor = connection.execute(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                list(columns.values()))
+        return cursor.lastrowid
+    finally:
+        connection.close()
+
+
+def run_from_row(row):
+    run = dict(row)
+    run["parameters"] = json.loads(run["parameters"])
+    run["solution"] = json.loads(run["solution"])
+    return run
+
+
+def best_and_worst_runs(dataset, algorithm, store_path=None):
+    """
+    Runs with the smallest and the largest best distance on the dataset, or None when there is no run.
+    Both are read from the (dataset, algorithm, best_distance) index.
+    """
+    connection = connect(store_path)
+    try:
+        runs = []
+        for order in ["ASC", "DESC"]:
+            row = connection.execute(
+                f"SELECT * FROM runs WHERE dataset = ? AND algorithm = ? AND best_distance IS NOT NULL "
+                f"ORDER BY best_distance {order} LIMIT 1", (get_instance_name(dataset), algorithm)).fetchone()
+            runs.append(run_from_row(row) if row is not None else None)
+        return tuple(runs)
+    finally:
+        connection.close()
+
+
+def latest_run(dataset, algorithm, parameters, store_path=None):
+    """
+    Most recent run on the dataset with the same run_key parameters, or None.
+    """
+    connection = connect(store_path)
+    try:
+        row = connection.execute(
+            f"SELECT * FROM runs WHERE dataset = ? AND algorithm = ? AND "
+            f"{' AND '.join(f'{name} = ?' for name in run_key)} ORDER BY id DESC LIMIT 1",
+            [get_instance_name(dataset), algorithm] + [parameters.get(name) for name in run_key]).fetchone()
+        return run_from_row(row) if row is not None else None
+    finally:
+        connection.close()
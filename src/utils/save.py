@@ -1,94 +1,139 @@
 import json
 import os
+import pickle
+from datetime import datetime
 from pathlib import Path
+
+import numpy as np
+
+from src.instance.instance import get_instance_name
+from src.utils.resultsStore import append_result, latest_run
 from src.utils.solution import Solution
+from src.utils.traces import TRACE_NAMES, trace_indices
 
 path_to_repo = Path(__file__).parent.parent.parent.resolve()  # This is the path to the repository
 
 
-def save_sa_data_and_solution(dataset, sa, solution: Solution):
-    sa_data = sa.__dict__
-    solution_data = solution.__dict__
+def seed_suffix(sa):
+    # Runs with the default seed keep their original file names
+    return f"_seed_{sa.seed}" if sa.seed else ""
 
-    # Create a DataFrame from the solution data
-    result = {
-        "data": sa_data,
-        "solution": solution_data
-    }
 
-    # Save the combined DataFrame to a CSV file
-    file_name = (f"results_{dataset}_nodes_{solution.algorithm}_{sa.neighborhood_selection}_{sa.cooling_schedule}"
-                 f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}.json")
+def run_suffix():
+    # The results store keeps every run, so each run gets trace and profile files of its own
+    return f"_{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}"
 
-    final_path = path_to_repo / "results"
 
-    if not os.path.exists(final_path):
-        os.makedirs(final_path)
+def get_sa_traces_file(dataset, sa, algorithm):
+    """
+    Path of the convergence traces of an SA run with these parameters, unique to this run.
+    """
+    file_name = (f"traces_{get_instance_name(dataset)}_nodes_{algorithm}_{sa.neighborhood_selection}_{sa.cooling_schedule}"
+                 f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
+                 f"{seed_suffix(sa)}{run_suffix()}.npz")
 
-    results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
+    return os.path.join(path_to_repo / "results" / "traces", file_name).replace("/", os.sep)
 
-    # Check if results.json already exists
-    if os.path.exists(results_file_path):
-        results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
 
-    with open(results_file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(result, jsonfile, ensure_ascii=False, indent=4)
-        print("Results saved successfully.")
+def get_sa_soft_traces_file(dataset, sa, algorithm):
+    """
+    Path of the convergence traces of a soft time window SA run with these parameters, unique to this run.
+    """
+    file_name = (f"traces_{get_instance_name(dataset)}_nodes_{algorithm}_{sa.neighborhood_selection}_{sa.cooling_schedule}"
+                 f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
+                 f"_p_too_early{sa.penalty_too_early}_p_too_late_{sa.penalty_too_late}_total_p_{sa.total_penalty}"
+                 f"{seed_suffix(sa)}{run_suffix()}.npz")
 
+    return os.path.join(path_to_repo / "results" / "traces", file_name).replace("/", os.sep)
 
-def save_sa_data_and_solution_soft(dataset, sa, solution: Solution):
-    sa_data = sa.__dict__
-    solution_data = solution.__dict__
 
-    # Create a DataFrame from the solution data
-    result = {
-        "data": sa_data,
-        "solution": solution_data
-    }
+def get_profile_file(traces_file_path):
+    """
+    Path of the cProfile capture of the run whose traces are saved to traces_file_path.
+    """
+    file_name = os.path.basename(traces_file_path).replace("traces_", "profile_", 1).replace(".npz", ".prof")
+
+    return os.path.join(path_to_repo / "results" / "profiles", file_name).replace("/", os.sep)
 
-    # Save the combined DataFrame to a CSV file
-    file_name = (f"results_{dataset}_nodes_{solution.algorithm}_{sa.neighborhood_selection}_{sa.cooling_schedule}"
+
+def get_sa_checkpoint_file(dataset, sa):
+    """
+    Path of the checkpoint of an SA run with these parameters.
+    """
+    file_name = (f"checkpoint_{get_instance_name(dataset)}_nodes_{sa.neighborhood_selection}_{sa.cooling_schedule}"
                  f"_initial_temp_{sa.initial_temperature}_alpha_{sa.alpha}_k_{sa.constant_k}_n_{sa.neighborhood_size}"
-                 f"_p_too_early{sa.penalty_too_early}_p_too_late_{sa.penalty_too_late}_total_p_{sa.total_penalty}.json")
+                 f"{seed_suffix(sa)}.pkl")
 
-    final_path = path_to_repo / "results_sa_soft"
+    return os.path.join(path_to_repo / "checkpoints", file_name).replace("/", os.sep)
 
-    if not os.path.exists(final_path):
-        os.makedirs(final_path)
 
-    results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
+def save_checkpoint(checkpoint_file_path, state):
+    """
+    Pickle the search state, replacing the previous checkpoint only once the new one is completely written.
+    """
+    os.makedirs(os.path.dirname(checkpoint_file_path), exist_ok=True)
+    temporary_file_path = f"{checkpoint_file_path}.tmp"
+    with open(temporary_file_path, 'wb') as checkpoint_file:
+        pickle.dump(state, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file_path, checkpoint_file_path)
 
-    # Check if results.json already exists
-    if os.path.exists(results_file_path):
-        results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
 
-    with open(results_file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(result, jsonfile, ensure_ascii=False, indent=4)
-        print("Results saved successfully.")
+def load_checkpoint(checkpoint_file_path):
+    with open(checkpoint_file_path, 'rb') as checkpoint_file:
+        return pickle.load(checkpoint_file)
 
 
-def save_solution(dataset, solution: Solution):
-    solution_data = solution.__dict__
+def routes_from_solution_data(solution_data):
+    return [[int(node) for node in route] for route in solution_data["best_routes"]]
 
-    # Create a DataFrame from the solution data
-    result = {
-        "solution": solution_data
-    }
 
-    # Save the combined DataFrame to a CSV file
-    file_name = f"results_{dataset}_{solution.algorithm}.json"
+def load_routes(results_file_path):
+    """
+    Best routes of a solution saved as a JSON results file.
+    """
+    with open(results_file_path, 'r', encoding='utf-8') as jsonfile:
+        result = json.load(jsonfile)
+    return routes_from_solution_data(result["solution"])
 
-    final_path = path_to_repo / "results"
 
-    if not os.path.exists(final_path):
-        os.makedirs(final_path)
+def load_latest_routes(dataset, sa, algorithm):
+    """
+    Best routes of the latest stored run of the algorithm with these parameters, with the id of the run, or None.
+    """
+    run = latest_run(dataset, algorithm, sa.__dict__)
+    if run is None:
+        return None
+    return routes_from_solution_data(run["solution"]), run["id"]
 
-    results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
 
-    # Check if results.json already exists
-    if os.path.exists(results_file_path):
-        results_file_path = os.path.join(final_path, f"{file_name}.json").replace("/", os.sep)
+def save_traces(traces_file_path, solution: Solution):
+    """
+    Save the convergence traces of the solution, with the position in the run of every kept value, to a compressed
+    .npz. Returns the solution data for the results store, which names the .npz instead of holding the traces.
+    """
+    os.makedirs(os.path.dirname(traces_file_path), exist_ok=True)
+    traces = {name: np.asarray(getattr(solution, name), dtype=float) for name in TRACE_NAMES}
+    for name, summary in solution.stats.get("traces", {}).items():
+        traces[f"{name}_index"] = trace_indices(summary)
+    np.savez_compressed(traces_file_path, **traces)
 
-    with open(results_file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(result, jsonfile, ensure_ascii=False, indent=4)
-        print("Results saved successfully.")
+    solution_data = {key: value for key, value in solution.__dict__.items() if key not in TRACE_NAMES}
+    solution_data["traces_file"] = os.path.basename(traces_file_path)
+    return solution_data
+
+
+def save_sa_data_and_solution(dataset, sa, solution: Solution):
+    solution_data = save_traces(get_sa_traces_file(dataset, sa, solution.algorithm), solution)
+    append_result(dataset, solution.algorithm, sa.__dict__, solution_data)
+    print("Results saved successfully.")
+
+
+def save_sa_data_and_solution_soft(dataset, sa, solution: Solution):
+    solution_data = save_traces(get_sa_soft_traces_file(dataset, sa, solution.algorithm), solution)
+    append_result(dataset, solution.algorithm, sa.__dict__, solution_data)
+    print("Results saved successfully.")
+
+
+def save_solution(dataset, solution: Solution):
+    append_result(dataset, solution.algorithm, {}, solution.__dict__)
+    print("Results saved successfully.")
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 
 
 @dataclass
@@ -12,20 +12,27 @@ class Solution:
     initial_routes: List[List[int]]
     best_routes: List[List[int]]
     runtime: float
+    # Convergence traces, the kept values of a src.utils.traces.Trace for SA runs, saved to .npz by save_traces
     temperatures: List[float] = field(default_factory=list)
     solutions: List[float] = field(default_factory=list)
     accepted_solutions: List[float] = field(default_factory=list)
     acceptance_probabilities: List[float] = field(default_factory=list)
+    # Per-run counters (proposals, accepts, infeasible rejects per operator), see src.utils.events.RunStats
+    stats: dict = field(default_factory=dict)
+    # Why the search stopped, e.g. "final_temperature" or the budget that ran out
+    termination: str = ""
 
 
 def createSolution(dataset: int, algorithm: str, neighborhood_selection: str, initial_routes: List[List[int]],
                    initial_distance: float, best_distance: float, best_routes: List[List[int]], runtime: float,
                    temperatures: List[float], solutions: List[float], accepted_solutions: List[float],
-                   acceptance_probabilities: List[float]) -> Solution:
+                   acceptance_probabilities: List[float], stats: Optional[dict] = None,
+                   termination: str = "") -> Solution:
     return Solution(dataset=dataset, algorithm=algorithm, neighborhood_selection=neighborhood_selection,
                     initial_distance=initial_distance, best_distance=best_distance,
                     initial_routes=initial_routes,
                     best_routes=best_routes,
                     runtime=runtime,
                     temperatures=temperatures, solutions=solutions, accepted_solutions=accepted_solutions,
-                    acceptance_probabilities=acceptance_probabilities)
+                    acceptance_probabilities=acceptance_probabilities, stats=stats or {},
+                    termination=termination)
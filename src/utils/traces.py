@@ -0,0 +1,65 @@
+import numpy as np
+
+# Trace fields of a Solution, saved to a .npz file in results/traces/ that its run in the SQLite results store refers to
+TRACE_NAMES = ["temperatures", "solutions", "accepted_solutions", "acceptance_probabilities"]
+
+
+class Trace:
+    """
+    Convergence trace of one run in a preallocated NumPy buffer of fixed capacity.
+    With "decimate" retention every stride-th value is kept; when the buffer is full every other kept value is
+    dropped and the stride doubles, so the trace always spans the whole run. With "ring" retention the last
+    capacity values are kept. A capacity of 0 records nothing.
+    """
+
+    def __init__(self, capacity, retention="decimate"):
+        if retention not in ["decimate", "ring"]:
+            raise ValueError("Trace retention must be either 'decimate' or 'ring'")
+        self.buffer = np.empty(capacity + capacity % 2)
+        self.capacity = len(self.buffer)
+        self.retention = retention
+        self.stride = 1
+        self.size = 0
+        # Values appended so far, kept or not
+        self.count = 0
+
+    def append(self, value):
+        count = self.count
+        self.count += 1
+        if not self.capacity:
+            return
+        if self.retention == "ring":
+            self.buffer[count % self.capacity] = value
+            self.size = min(self.count, self.capacity)
+            return
+        if count % self.stride:
+            return
+        if self.size == self.capacity:
+            # count is now a multiple of the doubled stride
+            self.size //= 2
+            self.buffer[:self.size] = self.buffer[::2]
+            self.stride *= 2
+        self.buffer[self.size] = value
+        self.size += 1
+
+    def values(self):
+        if self.retention == "ring" and self.count > self.capacity > 0:
+            start = self.count % self.capacity
+            return np.concatenate((self.buffer[start:], self.buffer[:start]))
+        return self.buffer[:self.size].copy()
+
+    def summary(self):
+        return {"count": self.count, "kept": self.size, "retention": self.retention, "stride": self.stride}
+
+
+def trace_summaries(**traces):
+    return {name: trace.summary() for name, trace in traces.items()}
+
+
+def trace_indices(summary):
+    """
+    Position in the run of every kept value of a trace, from its summary.
+    """
+    if summary["retention"] == "ring":
+        return np.arange(summary["count"] - summary["kept"], summary["count"])
+    return np.arange(summary["kept"]) * summary["stride"]
@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests import the solvers as src.*, like the scripts run from the repository with PYTHONPATH=.
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from src.utils import resultsStore, save  # noqa: E402
+
+
+@pytest.fixture
+def scratch_results(tmp_path, monkeypatch):
+    """
+    Results store and traces of the runs of a test in a temporary directory instead of results/.
+    """
+    monkeypatch.setattr(resultsStore, "results_store_path", tmp_path / "results.sqlite")
+    monkeypatch.setattr(save, "path_to_repo", tmp_path)
+    return tmp_path
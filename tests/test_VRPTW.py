@@ -0,0 +1,69 @@
+import pytest
+
+from src.instance.instance import get_instance
+from src.instance.instanceGenerator import generate_instance
+from src.simulatedAnnealing.calculations import get_distance_matrix
+from src.utils.feasibilityCheck import is_feasible
+from src.VRPTW.VRPTW import clarkewright_savings, create_savings_initial_solution, merge_to_fleet
+
+
+def visited_customers(routes):
+    return sorted(customer for route in routes for customer in route[1:-1])
+
+
+def reference_savings(instance):
+    """
+    The Clarke-Wright construction before the savings were vectorized: every pair of customers in descending
+    order of savings, searching the routes of both, then the routes that are feasible.
+    """
+    data = get_instance(instance)
+    distance_matrix = get_distance_matrix(instance)
+
+    def feasible(route):
+        return is_feasible(route, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                           distance_matrix)
+
+    savings = {}
+    for customer_1 in range(1, len(data.id)):
+        for customer_2 in range(customer_1 + 1, len(data.id)):
+            savings[(customer_1, customer_2)] = distance_matrix[0, customer_1] + distance_matrix[0, customer_2] - \
+                distance_matrix[customer_1, customer_2]
+    routes = [[0, customer, 0] for customer in range(1, len(data.id))]
+    for (customer_1, customer_2), _ in sorted(savings.items(), key=lambda saving: saving[1], reverse=True):
+        route_i = next(route for route in routes if customer_1 in route)
+        route_j = next(route for route in routes if customer_2 in route)
+        if route_i != route_j and feasible(route_i[:-1] + route_j[1:]):
+            routes.remove(route_i)
+            routes.remove(route_j)
+            routes.append(route_i[:-1] + route_j[1:])
+    return [route for route in routes if feasible(route)]
+
+
+@pytest.mark.parametrize("instance", [20, "R_tight_300"])
+def test_savings_start_fits_the_fleet(tmp_path, instance):
+    if instance == "R_tight_300":
+        # The savings construction needs 77 routes on this instance
+        instance = generate_instance(300, "R", "tight", file_path=tmp_path / "R_tight_300.txt")
+    data = get_instance(instance)
+    distance_matrix = get_distance_matrix(instance)
+    routes = create_savings_initial_solution(instance, data.num_vehicles)
+    assert len(routes) <= data.num_vehicles
+    assert all(len(route) > 2 for route in routes)
+    assert visited_customers(routes) == list(range(1, len(data.id)))
+    assert all(is_feasible(route, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                           distance_matrix) for route in routes)
+
+
+def test_merge_to_fleet_raises_without_a_feasible_merge():
+    data = get_instance(20)
+    with pytest.raises(ValueError, match="cannot be merged"):
+        merge_to_fleet(create_savings_initial_solution(20, data.num_vehicles), data, get_distance_matrix(20), 1)
+
+
+@pytest.mark.parametrize("instance", [9, 20, "C_wide_100", "R_tight_100"])
+def test_savings_match_the_reference_construction(scratch_results, instance):
+    if isinstance(instance, str):
+        instance_class, windows, num_customers = instance.split("_")
+        instance = generate_instance(int(num_customers), instance_class, windows,
+                                     file_path=scratch_results / f"{instance}.txt")
+    assert clarkewright_savings(instance, plot=False).best_routes == reference_savings(instance)
@@ -0,0 +1,16 @@
+import pytest
+
+from src.instance.instance import get_instance
+from src.instance.instanceGenerator import generate_instance
+from src.simulatedAnnealing.calculations import create_feasible_initial_solution
+
+
+def test_feasible_start_gives_up_after_max_attempts(tmp_path):
+    instance = generate_instance(100, file_path=tmp_path / "R_100.txt")
+    with pytest.raises(ValueError, match="after 100 attempts"):
+        create_feasible_initial_solution(instance, get_instance(instance).num_vehicles, max_attempts=100)
+
+
+def test_feasible_start_visits_every_customer_once():
+    routes = create_feasible_initial_solution(9, get_instance(9).num_vehicles)
+    assert sorted(customer for route in routes for customer in route[1:-1]) == list(range(1, 10))
@@ -0,0 +1,57 @@
+import random
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing.calculations import get_distance_matrix, get_neighbor_lists
+from src.simulatedAnnealing.n_opt import one_opt_operator
+from src.utils.feasibilityCheck import is_feasible, RouteSchedules
+from src.VRPTW.solomonInsertion import create_solomon_initial_solution
+
+
+def test_located_customers_follow_the_applied_moves():
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    neighbors = get_neighbor_lists(20, 5)
+    routes = create_solomon_initial_solution(20, data.num_vehicles)
+    schedules = RouteSchedules(routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                               data.service_time, distance_matrix)
+    random.seed(0)
+    for _ in range(200):
+        routes, _ = one_opt_operator(routes.copy(), data.demand, data.capacity, data.ready_time, data.due_time,
+                                     data.service_time, distance_matrix, schedules, neighbors)
+        schedules.update(routes)
+        for route_index, route in enumerate(routes):
+            for position in range(1, len(route) - 1):
+                assert schedules.locate(routes, route[position]) == (route_index, position)
+
+
+def test_constant_time_checks_agree_with_is_feasible():
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    customers = list(range(1, 21))
+
+    def feasible(route):
+        return is_feasible(route, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                           distance_matrix)
+
+    random.seed(0)
+    for _ in range(300):
+        # Half of the routes in random order, so that they miss a time window somewhere, half by due time
+        visited = random.sample(customers, random.randint(1, 12))
+        if random.random() < 0.5:
+            visited.sort(key=lambda customer: data.due_time[customer])
+        route = [0] + visited + [0]
+        others = [customer for customer in customers if customer not in visited]
+        schedules = RouteSchedules([route], data.demand, data.capacity, data.ready_time, data.due_time,
+                                   data.service_time, distance_matrix)
+        for position in range(1, len(route)):
+            customer = random.choice(others)
+            assert schedules.can_insert(0, route, position, customer) == \
+                feasible(route[:position] + [customer] + route[position:])
+        for position in range(1, len(route) - 1):
+            customer = random.choice(others)
+            assert schedules.can_remove(0, route, position) == feasible(route[:position] + route[position + 1:])
+            assert schedules.can_replace(0, route, position, customer) == \
+                feasible(route[:position] + [customer] + route[position + 1:])
+        for position in range(1, len(route) - 2):
+            assert schedules.can_swap_adjacent(0, route, position) == \
+                feasible(route[:position] + [route[position + 1], route[position]] + route[position + 2:])
@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing.calculations import calculate_total_distance, get_distance_matrix
+from src.utils.giantTour import GiantTour
+
+ROUTES = [[0, 1, 2, 3, 4, 5, 0], [0, 6, 7, 0], [0, 8, 9, 10, 11, 12, 13, 14, 0], [0, 15, 0], [0, 16, 17, 18, 19, 20, 0]]
+
+
+def random_moves(tour, num_moves):
+    # Moves between two different routes, keeping at least one customer in the source route of a relocation
+    for _ in range(num_moves):
+        route1, route2 = random.sample(range(tour.num_routes), 2)
+        length1, length2 = len(tour.route(route1)), len(tour.route(route2))
+        if random.random() < 0.5 and length1 > 3:
+            tour.relocate(route1, random.randint(1, length1 - 2), route2, random.randint(1, length2 - 1))
+        else:
+            tour.swap(route1, random.randint(1, length1 - 2), route2, random.randint(1, length2 - 2))
+
+
+def state(tour):
+    # index_of and route_of are only meaningful for customers
+    return [array.copy() for array in (tour.tour, tour.offsets, tour.index_of[1:], tour.route_of[1:], tour.loads,
+                                       tour.costs)]
+
+
+def test_undo_restores_the_tour():
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    tour = GiantTour(ROUTES, np.asarray(data.demand), distance_matrix)
+    for seed in range(20):
+        random.seed(seed)
+        random_moves(tour, 10)
+        tour.commit()
+        before = state(tour)
+        routes = tour.to_routes()
+
+        random_moves(tour, 5)
+        assert tour.touched_routes()
+        tour.undo()
+        assert tour.log == []
+        assert tour.to_routes() == routes
+        for restored, original in zip(state(tour), before):
+            assert np.array_equal(restored, original)
+
+
+def test_moves_keep_the_indices_and_caches_consistent():
+    random.seed(0)
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    tour = GiantTour(ROUTES, np.asarray(data.demand), distance_matrix)
+    random_moves(tour, 300)
+
+    routes = tour.to_routes()
+    assert sorted(customer for route in routes for customer in route[1:-1]) == list(range(1, 21))
+    for route_index, route in enumerate(routes):
+        for position, customer in enumerate(route[1:-1], start=1):
+            assert tour.route_of[customer] == route_index
+            assert tour.position(customer) == position
+        assert tour.loads[route_index] == pytest.approx(sum(data.demand[customer] for customer in route))
+    assert tour.distance == pytest.approx(calculate_total_distance(routes, distance_matrix))
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing.calculations import calculate_total_distance, get_distance_matrix, get_neighbor_lists
+from src.simulatedAnnealing.n_opt import one_opt_operator, two_opt_operator
+from src.simulatedAnnealing.simulatedAnnealing import propose_move
+from src.simulatedAnnealing.unrolling import relocation
+from src.simulatedAnnealing.simulatedAnnealing_soft_window import propose_move_soft, two_opt_operator_soft
+from src.utils.feasibilityCheck import RouteSchedules
+from src.VRPTW.solomonInsertion import create_solomon_initial_solution
+
+
+@pytest.mark.parametrize("operator", [two_opt_operator, two_opt_operator_soft])
+def test_two_opt_on_routes_of_different_lengths(operator):
+    # Swap positions drawn from the longer route used to overrun the shorter one (IndexError), and a route with a
+    # single customer had no two positions to draw (ValueError)
+    data = get_instance(9)
+    distance_matrix = get_distance_matrix(9)
+    routes = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 0], [0, 9, 0]]
+    for seed in range(50):
+        random.seed(seed)
+        new_routes, delta = operator([route.copy() for route in routes], data.demand, data.capacity,
+                                     data.ready_time, data.due_time, data.service_time, distance_matrix)
+        assert sorted(customer for route in new_routes for customer in route[1:-1]) == list(range(1, 10))
+        assert calculate_total_distance(new_routes, distance_matrix) == \
+            pytest.approx(calculate_total_distance(routes, distance_matrix) + delta)
+
+
+@pytest.mark.parametrize("operator", [one_opt_operator, two_opt_operator, relocation])
+def test_operators_leave_a_single_route_alone(operator):
+    data = get_instance(9)
+    routes = [[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 0]]
+    assert operator(routes, data.demand, data.capacity, data.ready_time, data.due_time, data.service_time,
+                    get_distance_matrix(9)) == (routes, 0)
+
+
+@pytest.mark.parametrize("neighborhood_selection", ["1_opt", "2_opt", "unroll"])
+@pytest.mark.parametrize("granular_neighbors", [0, 5])
+def test_deltas_match_the_recomputed_distance(neighborhood_selection, granular_neighbors):
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    neighbors = get_neighbor_lists(20, granular_neighbors) if granular_neighbors else None
+    routes = create_solomon_initial_solution(20, data.num_vehicles)
+    schedules = RouteSchedules(routes, data.demand, data.capacity, data.ready_time, data.due_time,
+                               data.service_time, distance_matrix)
+    distance = calculate_total_distance(routes, distance_matrix)
+    random.seed(0)
+    moves = 0
+    for _ in range(300):
+        routes, delta = propose_move(routes, data, distance_matrix, schedules, neighborhood_selection, neighbors)
+        schedules.update(routes)
+        distance += delta
+        moves += delta != 0
+        assert distance == pytest.approx(calculate_total_distance(routes, distance_matrix))
+    assert moves > 0
+
+
+@pytest.mark.parametrize("neighborhood_selection", ["1_opt", "2_opt", "unroll"])
+def test_soft_deltas_match_the_recomputed_distance(neighborhood_selection):
+    data = get_instance(20)
+    distance_matrix = get_distance_matrix(20)
+    routes = create_solomon_initial_solution(20, data.num_vehicles)
+    distance = calculate_total_distance(routes, distance_matrix)
+    random.seed(0)
+    moves = 0
+    for _ in range(300):
+        routes, delta = propose_move_soft(routes, data, distance_matrix, neighborhood_selection)
+        distance += delta
+        moves += delta != 0
+        assert distance == pytest.approx(calculate_total_distance(routes, distance_matrix))
+    assert moves > 0
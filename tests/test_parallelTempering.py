@@ -0,0 +1,21 @@
+from src.simulatedAnnealing.parallelTempering import parallelTempering
+from src.simulatedAnnealing.simulatedAnnealing import SimulatedAnnealing
+
+
+def test_no_rounds_when_already_cold(scratch_results):
+    sa = SimulatedAnnealing(starting_method="solomon", initial_temperature=1e-9, alpha=0.9, final_temperature=1,
+                            cooling_schedule="geometric", constant_k=0.7, neighborhood_size=5,
+                            neighborhood_selection="1_opt", plot=False)
+    solution = parallelTempering(20, sa)
+    assert solution.stats["rounds"] == 0
+    assert solution.best_distance == solution.initial_distance
+
+
+def test_counters_add_up_to_the_proposals(scratch_results):
+    sa = SimulatedAnnealing(starting_method="solomon", initial_temperature=0.5, alpha=0.9, final_temperature=0.001,
+                            cooling_schedule="geometric", constant_k=0.7, neighborhood_size=5,
+                            neighborhood_selection="1_opt", plot=False)
+    stats = parallelTempering(20, sa, workers=1).stats
+    assert stats["proposals"] == stats["improving_accepts"] + stats["uphill_accepts"] + stats["uphill_rejects"] + \
+        stats["neutral_moves"]
+    assert stats["neutral_moves"] > 0
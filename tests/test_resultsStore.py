@@ -0,0 +1,24 @@
+import numpy as np
+
+from src.simulatedAnnealing.simulatedAnnealing import simulatedAnnealing, SimulatedAnnealing
+from src.utils.resultsStore import connect
+
+
+def test_runs_with_the_same_parameters_keep_their_own_traces(scratch_results):
+    # max_evaluations is not part of the file names, so both runs share every named parameter
+    for max_evaluations in [50, 100]:
+        sa = SimulatedAnnealing(starting_method="solomon", initial_temperature=0.5, alpha=0.9,
+                                final_temperature=0.001, cooling_schedule="geometric", constant_k=0.7,
+                                neighborhood_size=5, neighborhood_selection="1_opt", max_evaluations=max_evaluations,
+                                plot=False)
+        simulatedAnnealing(20, sa)
+
+    connection = connect()
+    try:
+        rows = connection.execute("SELECT traces_file FROM runs ORDER BY id").fetchall()
+    finally:
+        connection.close()
+    assert len({row["traces_file"] for row in rows}) == 2
+    for row, max_evaluations in zip(rows, [50, 100]):
+        with np.load(scratch_results / "results" / "traces" / row["traces_file"]) as traces:
+            assert len(traces["solutions"]) == max_evaluations
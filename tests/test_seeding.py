@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from src.simulatedAnnealing.simulatedAnnealing import simulatedAnnealing, SimulatedAnnealing
+
+
+def run_sa(dataset, starting_method, seed):
+    sa = SimulatedAnnealing(starting_method=starting_method, initial_temperature=0.5, alpha=0.9,
+                            final_temperature=0.001, cooling_schedule="geometric", constant_k=0.7,
+                            neighborhood_size=5, neighborhood_selection="1_opt", seed=seed, plot=False)
+    return simulatedAnnealing(dataset, sa)
+
+
+@pytest.mark.parametrize("dataset, starting_method", [(9, "feasible"), (20, "solomon"), (20, "savings")])
+def test_same_seed_same_run(scratch_results, dataset, starting_method):
+    first = run_sa(dataset, starting_method, seed=3)
+    second = run_sa(dataset, starting_method, seed=3)
+    assert first.best_routes == second.best_routes
+    assert first.best_distance == second.best_distance
+    assert first.stats["proposals"] == second.stats["proposals"]
+
+
+def test_same_seed_same_run_from_file(scratch_results):
+    start = run_sa(20, "solomon", seed=3)
+    results_file_path = scratch_results / "start.json"
+    results_file_path.write_text(json.dumps({"solution": {"best_routes": start.best_routes}}, default=int))
+    runs = []
+    for _ in range(2):
+        sa = SimulatedAnnealing(starting_method="file", initial_temperature=0.5, alpha=0.9, final_temperature=0.001,
+                                cooling_schedule="geometric", constant_k=0.7, neighborhood_size=5,
+                                neighborhood_selection="1_opt", seed=3, starting_file=str(results_file_path),
+                                plot=False)
+        runs.append(simulatedAnnealing(20, sa))
+    assert runs[0].best_routes == runs[1].best_routes
+    assert runs[0].best_distance == runs[1].best_distance
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from src.instance.instance import get_instance
+from src.simulatedAnnealing import simulatedAnnealing as hard_window
+from src.simulatedAnnealing.coolingSchedules import CoolingSchedule
+from src.simulatedAnnealing.simulatedAnnealing import create_initial_routes, resume_simulatedAnnealing, \
+    simulatedAnnealing, SimulatedAnnealing
+
+
+def hard_sa(**parameters):
+    return SimulatedAnnealing(**{
+        "starting_method": "feasible", "initial_temperature": 0.5, "alpha": 0.9, "final_temperature": 0.001,
+        "cooling_schedule": "geometric", "constant_k": 0.7, "neighborhood_size": 5,
+        "neighborhood_selection": "1_opt", "plot": False, **parameters})
+
+
+def test_file_start_leaves_out_empty_routes(scratch_results):
+    results_file_path = scratch_results / "start.json"
+    routes = [[0, 0]] + [[0, customer, 0] for customer in range(1, 10)] + [[0, 0]]
+    results_file_path.write_text(json.dumps({"solution": {"best_routes": routes}}))
+    sa = hard_sa(starting_method="file", starting_file=str(results_file_path))
+    initial_routes = create_initial_routes(9, sa, get_instance(9).num_vehicles)
+    assert len(initial_routes) <= get_instance(9).num_vehicles
+    assert all(len(route) > 2 for route in initial_routes)
+
+
+@pytest.mark.parametrize("parameters", [{"neighborhood_selection": "unroll"}, {"neighborhood_selection": "2_opt"},
+                                        {"granular_neighbors": 5}, {"batch_size": 16}])
+def test_counters_add_up_to_the_proposals(scratch_results, parameters):
+    stats = simulatedAnnealing(20, hard_sa(starting_method="solomon", **parameters)).stats
+    assert stats["proposals"] == stats["improving_accepts"] + stats["uphill_accepts"] + stats["uphill_rejects"] + \
+        stats["neutral_moves"]
+
+
+def test_adaptive_target_without_temperature_range():
+    # The target used to divide by the log of initial over final temperature
+    sa = hard_sa(cooling_schedule="adaptive", target_acceptance=0.4)
+    cooling = CoolingSchedule(sa, 1.0, 1.0)
+    assert cooling.target_acceptance(1.0) == 0.4
+    cooling.record(1.0, True)
+    assert cooling.reduce_temperature(1.0) == pytest.approx(0.9 ** 2)
+    assert CoolingSchedule(sa, 1.0, 0.01).target_acceptance(0.1) == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize("parameters", [{}, {"batch_size": 16}, {"cooling_schedule": "adaptive"}])
+def test_resumed_run_matches_the_uninterrupted_one(scratch_results, monkeypatch, parameters):
+    # Checkpoints are due at every step, only the one saved after 200 steps is written
+    checkpoint_file_path = scratch_results / "checkpoint.pkl"
+    save_checkpoint = hard_window.save_checkpoint
+    saves = []
+
+    def save_once(file_path, state):
+        saves.append(file_path)
+        if len(saves) == 200:
+            save_checkpoint(file_path, state)
+
+    monkeypatch.setattr(hard_window, "save_checkpoint", save_once)
+    sa = hard_sa(starting_method="solomon", checkpoint_interval=0, checkpoint_file=str(checkpoint_file_path),
+                 **parameters)
+    solution = simulatedAnnealing(20, sa)
+    assert len(saves) > 200
+    resumed = resume_simulatedAnnealing(str(checkpoint_file_path))
+
+    assert resumed.best_routes == solution.best_routes
+    assert resumed.best_distance == solution.best_distance
+    assert resumed.stats == solution.stats
+    for trace in ["temperatures", "solutions", "accepted_solutions", "acceptance_probabilities"]:
+        assert list(getattr(resumed, trace)) == list(getattr(solution, trace))
@@ -0,0 +1,41 @@
+import pytest
+
+from src.simulatedAnnealing import simulatedAnnealing_soft_window
+from src.simulatedAnnealing.coolingSchedules import CoolingSchedule
+from src.simulatedAnnealing.simulatedAnnealing_soft_window import simulatedAnnealing_soft, SimulatedAnnealingSoft
+
+
+def soft_sa(**parameters):
+    return SimulatedAnnealingSoft(**{
+        "starting_method": "feasible", "initial_temperature": 1, "alpha": 0.9, "final_temperature": 0.01,
+        "cooling_schedule": "geometric", "constant_k": 0.7, "neighborhood_size": 10,
+        "neighborhood_selection": "1_opt", "penalty_too_early": 1, "penalty_too_late": 1, "total_penalty": 1000,
+        "plot": False, **parameters})
+
+
+@pytest.mark.parametrize("total_penalty", [0, 1000])
+def test_counters_add_up_to_the_proposals(scratch_results, total_penalty):
+    stats = simulatedAnnealing_soft(9, soft_sa(total_penalty=total_penalty)).stats
+    assert stats["proposals"] == stats["improving_accepts"] + stats["uphill_accepts"] + stats["uphill_rejects"]
+    assert stats["uphill_rejects"] > 0
+
+
+def test_adaptive_cooling_sees_the_rejected_moves(scratch_results, monkeypatch):
+    recorded = []
+    record = CoolingSchedule.record
+
+    def spy(self, delta, accepted):
+        recorded.append((delta, accepted))
+        record(self, delta, accepted)
+
+    monkeypatch.setattr(CoolingSchedule, "record", spy)
+    stats = simulatedAnnealing_soft(9, soft_sa(cooling_schedule="adaptive")).stats
+    assert len(recorded) == stats["uphill_rejects"]
+    assert any(delta > 0 for delta, _ in recorded)
+
+
+def test_phase_profile_times_the_feasibility_check(scratch_results):
+    is_feasible_soft = simulatedAnnealing_soft_window.is_feasible_soft
+    stats = simulatedAnnealing_soft(9, soft_sa(profile="phases")).stats
+    assert stats["profile"]["seconds"]["feasibility"] > 0
+    assert simulatedAnnealing_soft_window.is_feasible_soft is is_feasible_soft
@@ -0,0 +1,23 @@
+import pytest
+
+from src.instance.instance import get_instance
+from src.instance.instanceGenerator import generate_instance
+from src.VRPTW.solomonInsertion import create_solomon_initial_solution
+
+
+def test_solomon_start_has_no_empty_routes(tmp_path):
+    instance = generate_instance(300, "C", "wide", file_path=tmp_path / "C_wide_300.txt")
+    data = get_instance(instance)
+    routes = create_solomon_initial_solution(instance, data.num_vehicles)
+    assert len(routes) <= data.num_vehicles
+    assert all(len(route) > 2 for route in routes)
+    assert sorted(customer for route in routes for customer in route[1:-1]) == list(range(1, len(data.id)))
+
+
+@pytest.mark.parametrize("parameters, expected_routes", [
+    ({}, [[0, 9, 7, 18, 3, 8, 16, 14, 15, 0], [0, 5, 20, 1, 12, 19, 11, 10, 13, 6, 17, 0], [0, 2, 4, 0]]),
+    ({"alpha_1": 0.5, "seed_criterion": "earliest_deadline"},
+     [[0, 20, 1, 3, 18, 7, 8, 11, 0], [0, 2, 5, 4, 10, 9, 12, 13, 6, 14, 16, 15, 0], [0, 19, 17, 0]])])
+def test_cached_insertion_costs_build_the_same_routes(parameters, expected_routes):
+    # Routes of the construction that evaluated every insertion from scratch
+    assert create_solomon_initial_solution(20, get_instance(20).num_vehicles, **parameters) == expected_routes
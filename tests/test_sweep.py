@@ -0,0 +1,14 @@
+from src import sweep
+from src.simulatedAnnealing.simulatedAnnealing import simulatedAnnealing, SimulatedAnnealing
+
+
+def test_sweep_rows_with_the_same_seed_repeat(scratch_results, monkeypatch):
+    monkeypatch.setattr(sweep, "path_to_repo", scratch_results)
+    params = {"starting_method": ["solomon", "savings"], "initial_temperature": [0.5], "alpha": [0.9],
+              "final_temperature": [0.001], "cooling_schedule": ["geometric"], "constant_k": [0.7],
+              "neighborhood_size": [5], "neighborhood_selection": ["1_opt"], "plot": [False]}
+    rows = sweep.run_sweep(20, simulatedAnnealing, SimulatedAnnealing, params, seeds=(1, 1), workers=2)
+    for starting_method in params["starting_method"]:
+        first, second = [row for row in rows if row["starting_method"] == starting_method]
+        assert first["best_routes"] == second["best_routes"]
+        assert first["best_distance"] == second["best_distance"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.utils.traces import Trace, trace_indices
+
+
+@pytest.mark.parametrize("retention", ["decimate", "ring"])
+@pytest.mark.parametrize("capacity", [1, 2, 7, 16])
+def test_kept_values_are_at_the_summary_indices(retention, capacity):
+    # Each value is its position in the run, so the kept values are their own indices
+    trace = Trace(capacity, retention)
+    for count in range(200):
+        trace.append(count)
+        summary = trace.summary()
+        assert summary["count"] == count + 1
+        assert summary["kept"] <= trace.capacity
+        assert np.array_equal(trace.values(), trace_indices(summary))
+
+
+def test_decimated_trace_spans_the_run():
+    trace = Trace(10)
+    for count in range(1000):
+        trace.append(count)
+        values = trace.values()
+        assert values[0] == 0
+        # The last kept value is less than one stride behind
+        assert count - values[-1] < trace.stride
+        # and at least half of the buffer is in use
+        assert len(values) >= min(count + 1, trace.capacity // 2)
+
+
+def test_ring_trace_keeps_the_last_values():
+    trace = Trace(10, "ring")
+    for count in range(25):
+        trace.append(count)
+    assert np.array_equal(trace.values(), np.arange(15, 25))
+
+
+def test_empty_trace_records_only_the_count():
+    trace = Trace(0)
+    for count in range(5):
+        trace.append(count)
+    assert len(trace.values()) == 0
+    assert trace.summary()["count"] == 5